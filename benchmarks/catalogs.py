@@ -0,0 +1,68 @@
+"""
+Synthetic brand catalogs in the shape of the Firestore "products" document, for offline benchmarks.
+"""
+import os
+import random
+import sys
+
+# Benchmarks import the service modules the same way gunicorn does, from src/.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def make_color(rng, gray_ratio=0.3):
+    if rng.random() < gray_ratio:
+        level = rng.randint(0, 255)
+        red, green, blue = (min(max(level + rng.randint(-6, 6), 0), 255) for _ in range(3))
+    else:
+        red, green, blue = rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)
+
+    prefix = "#" if rng.random() < 0.5 else ""
+    return "%s%02X%02X%02X" % (prefix, red, green, blue)
+
+
+def make_catalog(types, products_per_type, seed=0):
+    """
+    Builds a brand catalog as returned by Products.get_products_by_brand().
+
+    Returns:
+        list: One {type id: [product, ...]} dictionary per product type.
+    """
+    rng = random.Random(seed)
+    catalog = []
+
+    for type_index in range(types):
+        type_id = "type-%d" % type_index
+        catalog.append({
+            type_id: [
+                {
+                    "id": "%s-product-%d" % (type_id, product_index),
+                    "name": "Product %d" % product_index,
+                    "price": "%.2f" % rng.uniform(5, 250),
+                    "color": [make_color(rng)],
+                }
+                for product_index in range(products_per_type)
+            ]
+        })
+
+    return catalog
+
+
+def make_requirements(types):
+    return [{"id": "type-%d" % type_index, "value": 1} for type_index in range(types)]
+
+
+def load_catalog(types, products_per_type, seed=0):
+    """
+    Converts and filters a synthetic catalog the way /generate does.
+
+    Returns:
+        tuple: The filtered products dictionary, its ProductFeatureIndex and the genome limits.
+    """
+    from database import GenomeLimitCalculator, ProductFeatureIndex, ProductFilter, ProductListConverter
+
+    products = ProductListConverter(products=make_catalog(types, products_per_type, seed)).convert_to_dictionary()
+    products = ProductFilter(requested_product_types=make_requirements(types), products=products) \
+        .find_requested_products_by_types()
+    limits = GenomeLimitCalculator(product_dict=products).calculate_genome_limits()
+
+    return products, ProductFeatureIndex(products=products), limits
@@ -0,0 +1,50 @@
+"""
+Measures the cold start of a worker: importing the app and answering its first request.
+
+Every run starts a fresh interpreter, as a new Cloud Run instance or gunicorn worker
+does, and times the import of app.py and a first GET / through the Flask test client.
+No Firestore access is needed, so the numbers cover what a worker pays before it can
+serve anything.
+
+Usage: python benchmarks/cold_start.py [--repeat 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.app.test_client().get("/")
+served = time.perf_counter()
+print(json.dumps({"import": imported - started, "first_response": served - started, "modules": len(sys.modules)}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    arguments = parser.parse_args()
+
+    runs = []
+    for _ in range(arguments.repeat):
+        output = subprocess.run([sys.executable, "-c", PROBE], cwd=SOURCE, capture_output=True, check=True, text=True)
+        runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    print(json.dumps({
+        "repeat": arguments.repeat,
+        "import_seconds": statistics.median(run["import"] for run in runs),
+        "first_response_seconds": statistics.median(run["first_response"] for run in runs),
+        "modules": runs[-1]["modules"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compares the wall-clock time of the island model against running the same islands serially.
+
+Usage: python benchmarks/island_benchmark.py [--workers 4] [--generations 64]
+"""
+import argparse
+import json
+import time
+
+from catalogs import load_catalog
+
+from methods.batchfitness import BatchFitness
+from methods.genetic import Evolution
+from methods.island import IslandModel
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--types", type=int, default=8)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--size", type=int, default=12)
+    parser.add_argument("--generations", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--migration-interval", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    arguments = parser.parse_args()
+
+    products, features, limits = load_catalog(arguments.types, arguments.products)
+    batch_fitness = BatchFitness(products=products, features=features)
+
+    serial, islands = [], []
+
+    for _ in range(arguments.repeat):
+        started = time.perf_counter()
+        for island in range(arguments.workers):
+            evolution = Evolution(limits=limits, population_fitness=batch_fitness)
+            for population, scores in evolution.generations(size=arguments.size, generation=arguments.generations):
+                pass
+        serial.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        IslandModel(
+            limits=limits,
+            population_fitness=batch_fitness,
+            workers=arguments.workers,
+            migration_interval=arguments.migration_interval,
+            key="benchmark"
+        ).run(size=arguments.size, generation=arguments.generations)
+        islands.append(time.perf_counter() - started)
+
+    print(json.dumps({
+        "types": arguments.types,
+        "products_per_type": arguments.products,
+        "workers": arguments.workers,
+        "generations": arguments.generations,
+        "serial_seconds": min(serial),
+        "island_seconds": min(islands),
+        "speedup": min(serial) / min(islands),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
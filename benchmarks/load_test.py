@@ -0,0 +1,176 @@
+"""
+Load-tests /generate served by gunicorn threads, as deployed, against the asyncio serving mode.
+
+Both servers run one worker process on in-memory data whose key and catalog lookups
+each wait --latency seconds, standing in for Firestore round trips. The key, catalog
+and result caches are disabled, so every request pays both lookups as a cold request
+does. Catalogs are small, so the search itself takes a few milliseconds.
+
+    gunicorn   gunicorn --workers 1 --threads 8, the Dockerfile command
+    asyncio    uvicorn running asgi.AsyncApp with an AsyncInMemoryBackend
+
+Usage: python benchmarks/load_test.py [--requests 400] [--concurrency 32] [--latency 0.05]
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from catalogs import make_catalog, make_requirements
+
+import database
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(BENCHMARKS, "..", "src")
+
+LATENCY = float(os.environ.get("LOAD_TEST_LATENCY", 0.05))
+BRANDS = 16
+TYPES = 4
+KEYS = {"key-%d" % index for index in range(64)}
+UNCACHED = {
+    "CATALOG_CACHE_TTL": "0",
+    "KEY_CACHE_TTL": "0",
+    "KEY_CACHE_NEGATIVE_TTL": "0",
+    "RESULT_CACHE_TTL": "0",
+}
+
+
+def catalogs():
+    return {"brand-%d" % index: make_catalog(TYPES, 8, seed=index) for index in range(BRANDS)}
+
+
+class SlowCatalogBackend(database.InMemoryCatalogBackend):
+    def fetch(self, brand):
+        time.sleep(LATENCY)
+        return super().fetch(brand)
+
+
+class SlowKeyValidator:
+    def validate_key(self, key):
+        time.sleep(LATENCY)
+        return key in KEYS
+
+
+def wsgi_app():
+    """
+    The Flask app on slow in-memory data, for gunicorn "load_test:wsgi_app()".
+    """
+    import app
+
+    app.catalog_cache.backend = SlowCatalogBackend(catalogs())
+    database.key_validator.validator = SlowKeyValidator()
+    return app.app
+
+
+def asgi_app():
+    """
+    The asyncio app on slow in-memory data, for uvicorn --factory load_test:asgi_app.
+    """
+    import asgi
+
+    return asgi.AsyncApp(backend=database.AsyncInMemoryBackend(catalogs(), keys=KEYS, latency=LATENCY))
+
+
+SERVERS = {
+    "gunicorn": ["-m", "gunicorn", "--workers", "1", "--threads", "8", "--bind", "127.0.0.1:%d",
+                 "load_test:wsgi_app()"],
+    "asyncio": ["-m", "uvicorn", "--factory", "--workers", "1", "--port", "%d", "--log-level", "warning",
+                "load_test:asgi_app"],
+}
+
+
+def start(name, port, latency):
+    arguments = [argument % port if "%d" in argument else argument for argument in SERVERS[name]]
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join([BENCHMARKS, SOURCE]),
+                       LOAD_TEST_LATENCY=str(latency), **UNCACHED)
+    server = subprocess.Popen([sys.executable] + arguments, cwd=SOURCE, env=environment,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    for _ in range(200):
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/")
+            connection.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.05)
+
+    server.kill()
+    raise RuntimeError("%s did not start" % name)
+
+
+def load(port, requests, concurrency):
+    """
+    Sends requests /generate calls from concurrency client threads.
+
+    Returns:
+        dict: Throughput, latency percentiles, status counts and error bodies, sent with a 200.
+    """
+    latencies, statuses, errors = [], {}, [0]
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        for index in counter:
+            body = json.dumps({"requirements": make_requirements(TYPES), "seed": index})
+            headers = {
+                "Content-Type": "application/json",
+                "brand": "brand-%d" % (index % BRANDS),
+                "secret-key": "key-%d" % (index % len(KEYS)),
+            }
+            started = time.perf_counter()
+            connection.request("POST", "/generate", body=body, headers=headers)
+            response = connection.getresponse()
+            result = json.loads(response.read())
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+                errors[0] += isinstance(result, dict) and "error" in result
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests_per_second": requests / elapsed,
+        "p50_seconds": statistics.median(latencies),
+        "p99_seconds": latencies[int(len(latencies) * 0.99) - 1],
+        "statuses": statuses,
+        "errors": errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    parser.add_argument("--port", type=int, default=8790)
+    arguments = parser.parse_args()
+
+    report = {"requests": arguments.requests, "concurrency": arguments.concurrency, "latency": arguments.latency}
+
+    for offset, name in enumerate(SERVERS):
+        server = start(name, arguments.port + offset, arguments.latency)
+        try:
+            report[name] = load(arguments.port + offset, arguments.requests, arguments.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compares the payload size and encode time of the /generate response formats.
+
+Recommendations come from a real search over a synthetic catalog whose product
+documents carry descriptions, image URLs and attributes, as production documents do.
+Every format is encoded the way its route does it, all with serialization.dumps:
+
+    full            jsonify() of the recommendations, the default response
+    full_fields     jsonify() with ?fields=name,price,color
+    compact         ?format=compact, product ids and one products table
+    compact_fields  ?format=compact&fields=name,price,color
+
+With --stdlib every format uses the standard json module, as when orjson is missing.
+
+Usage: python benchmarks/response_format.py [--types 3] [--products 30] [--document-size 2000] [--stdlib]
+"""
+import argparse
+import json
+import random
+import time
+
+from catalogs import make_catalog, make_requirements
+
+import serialization
+from app import app, RecommendationSearch
+from database import CatalogEntry, ProductListConverter
+from flask import jsonify
+from serialization import ProductTable, dumps, full_recommendation
+
+FIELDS = ["name", "price", "color"]
+
+
+def enrich(catalog, document_size, seed=0):
+    """
+    Adds the bulky attributes of production product documents, about document_size bytes each.
+    """
+    rng = random.Random(seed)
+
+    for products in catalog:
+        for values in products.values():
+            for product in values:
+                product["description"] = "".join(rng.choice("abcdefghij ") for _ in range(document_size // 2))
+                product["images"] = ["https://images.example.com/%s/%d.jpg" % (product["id"], index) for index in range(6)]
+                product["attributes"] = {"attribute-%d" % index: rng.random() for index in range(document_size // 80)}
+
+    return catalog
+
+
+def encoders(recommendations):
+    def full():
+        return jsonify(recommendations).get_data()
+
+    def full_fields():
+        return jsonify([full_recommendation(recommendation, FIELDS) for recommendation in recommendations]).get_data()
+
+    def compact(fields=None):
+        table = ProductTable(fields=fields)
+        compacted = [table.compact(recommendation) for recommendation in recommendations]
+        return dumps({"recommendations": compacted, "products": table.products})
+
+    return {
+        "full": full,
+        "full_fields": full_fields,
+        "compact": compact,
+        "compact_fields": lambda: compact(FIELDS),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--types", type=int, default=3)
+    parser.add_argument("--products", type=int, default=30)
+    parser.add_argument("--document-size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--stdlib", action="store_true", help="Encode without orjson.")
+    arguments = parser.parse_args()
+
+    if arguments.stdlib:
+        serialization.orjson = None
+
+    catalog = enrich(make_catalog(arguments.types, arguments.products), arguments.document_size)
+    entry = CatalogEntry("benchmark", ProductListConverter(products=catalog).convert_to_dictionary())
+    search = RecommendationSearch(entry, make_requirements(arguments.types), seed=0)
+    recommendations = [
+        search.recommendation(genome=genome, score=score, data=data) for genome, score, data in search.pool(size=12)
+    ]
+
+    report = {
+        "recommendations": len(recommendations),
+        "encoder": "orjson" if serialization.orjson is not None else "json",
+    }
+
+    with app.app_context():
+        for name, encode in encoders(recommendations).items():
+            started = time.perf_counter()
+            for _ in range(arguments.repeat):
+                payload = encode()
+            report[name] = {
+                "bytes": len(payload),
+                "encode_ms": (time.perf_counter() - started) / arguments.repeat * 1000,
+            }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
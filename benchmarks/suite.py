@@ -0,0 +1,195 @@
+"""
+Offline micro-benchmarks of the fitness function, the genetic algorithm and its helpers.
+
+Every case runs on synthetic catalogs shaped like the Firestore "products" document,
+across growing catalog sizes and numbers of requirements. Results are written as JSON
+so runs can be compared:
+
+    python benchmarks/suite.py --output baseline.json
+    python benchmarks/suite.py --output current.json --compare baseline.json --tolerance 0.2
+
+With --compare the process exits with status 1 when a case got slower than the
+tolerance allows.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from functools import partial
+
+import numpy
+
+from catalogs import load_catalog
+
+from app import fitness
+from database import SimilarityChecker
+from methods.batchfitness import BatchFitness, IncrementalFitness
+from methods.colorsimilarity import HueScore, SaturationScore
+from methods.compact import CompactEvolution
+
+# Higher is better for throughput metrics, lower is better for latencies.
+HIGHER_IS_BETTER = {"calls_per_second": True, "genomes_per_second": True, "seconds": False}
+
+
+def measure(function, repeat, number):
+    """
+    Runs function number times per round and returns the fastest round, in seconds per call.
+    """
+    best = float("inf")
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - started) / number)
+
+    return best
+
+
+def random_genomes(limits, count, seed=0):
+    rng = random.Random(seed)
+    return [[rng.randint(0, limit) for limit in limits] for _ in range(count)]
+
+
+def bench_fitness(types, products, repeat):
+    catalog, features, limits = load_catalog(types, products)
+    genomes = random_genomes(limits, 500)
+    score = partial(fitness, products=catalog, features=features)
+
+    seconds = measure(lambda: [score(genome=genome) for genome in genomes], repeat, 1) / len(genomes)
+    yield "fitness", "calls_per_second", 1 / seconds
+
+    batch_fitness = BatchFitness(products=catalog, features=features)
+    seconds = measure(lambda: batch_fitness.evaluate(genomes), repeat, 5) / len(genomes)
+    yield "batch_fitness", "genomes_per_second", 1 / seconds
+
+
+def bench_evolution(types, products, repeat):
+    catalog, features, limits = load_catalog(types, products)
+    batch_fitness = BatchFitness(products=catalog, features=features)
+
+    def evolve_compact(incremental=None):
+        evolution = CompactEvolution(
+            limits=limits,
+            population_fitness=batch_fitness.evaluate,
+            rng=numpy.random.default_rng(0),
+            incremental=incremental
+        )
+        for population, scores in evolution.generations(size=12, generation=16):
+            pass
+        SimilarityChecker(evolution.population.tolist()).remove_similar_lists(threshold=3)
+
+    yield "compact_evolution", "seconds", measure(evolve_compact, repeat, 5)
+    yield "compact_evolution_incremental", "seconds", measure(
+        partial(evolve_compact, IncrementalFitness(batch_fitness)), repeat, 5
+    )
+
+
+def bench_similarity(types, population, repeat):
+    genomes = random_genomes([49] * types, population)
+    yield "similarity_checker", "seconds", measure(
+        lambda: SimilarityChecker(genomes).remove_similar_lists(threshold=3, indexed=False), repeat, 1
+    )
+    yield "similarity_checker_indexed", "seconds", measure(
+        lambda: SimilarityChecker(genomes).remove_similar_lists(threshold=3, indexed=True), repeat, 1
+    )
+
+
+def bench_scores(features, repeat):
+    rng = random.Random(features)
+    hues = [rng.random() for _ in range(features)]
+    yield "hue_score", "calls_per_second", 1 / measure(lambda: HueScore(hues).calculate(), repeat, 2000)
+    yield "saturation_score", "calls_per_second", 1 / measure(lambda: SaturationScore(hues).calculate(), repeat, 2000)
+
+
+def cases(quick):
+    types = [2, 4, 8] if quick else [2, 4, 8, 12]
+    products = [50, 500] if quick else [50, 500, 5000]
+    populations = [12, 200, 2000] if quick else [12, 200, 2000, 10000]
+
+    for type_count in types:
+        for product_count in products:
+            params = {"types": type_count, "products_per_type": product_count}
+            yield params, partial(bench_fitness, type_count, product_count)
+            yield params, partial(bench_evolution, type_count, product_count)
+
+        for population in populations:
+            yield {"types": type_count, "population": population}, partial(bench_similarity, type_count, population)
+
+        yield {"features": type_count}, partial(bench_scores, type_count)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Lists the cases that got worse than tolerance compared to a baseline run.
+
+    Returns:
+        list: One message per regression.
+    """
+    previous = {(item["name"], json.dumps(item["params"], sort_keys=True)): item for item in baseline["results"]}
+    regressions = []
+
+    for item in results:
+        before = previous.get((item["name"], json.dumps(item["params"], sort_keys=True)))
+        if before is None:
+            continue
+
+        change = item["value"] / before["value"] - 1
+        worse = -change if HIGHER_IS_BETTER[item["metric"]] else change
+
+        if worse > tolerance:
+            regressions.append("%s %s: %s %.4g -> %.4g (%+.1f%%)" % (
+                item["name"], item["params"], item["metric"], before["value"], item["value"], change * 100
+            ))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", help="Write the results to this JSON file instead of stdout.")
+    parser.add_argument("--compare", help="A previous results file to check for regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quick", action="store_true", help="Run a smaller grid of cases.")
+    arguments = parser.parse_args()
+
+    random.seed(0)
+    results = []
+
+    for params, case in cases(arguments.quick):
+        for name, metric, value in case(repeat=arguments.repeat):
+            results.append({"name": name, "params": params, "metric": metric, "value": value})
+            print("%-30s %-45s %-20s %.4g" % (name, params, metric, value), file=sys.stderr)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+    if arguments.output:
+        with open(arguments.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if arguments.compare:
+        with open(arguments.compare) as baseline:
+            regressions = compare(results, json.load(baseline), arguments.tolerance)
+
+        for regression in regressions:
+            print("REGRESSION " + regression, file=sys.stderr)
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
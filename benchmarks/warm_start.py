@@ -0,0 +1,104 @@
+"""
+Measures how many generations the GA needs to find K qualifying combinations, with and without warm starts.
+
+For every trial --prime searches first run on a cold warm-start store. Another request
+of the same brand and requested types, with another random seed, then evolves once
+from an empty store and once from the genomes the earlier requests stored. Every run
+evolves one compact population without early stopping until its hall of fame holds
+K combinations, or up to --max-generations.
+
+Usage: python benchmarks/warm_start.py [--types 6] [--products 60] [--k 3] [--trials 10] [--prime 3]
+"""
+import argparse
+import json
+import statistics
+
+import numpy
+
+from catalogs import make_catalog, make_requirements
+
+import app
+from database import CatalogEntry, ProductListConverter
+from methods.compact import CompactEvolution
+from methods.genetic import HallOfFame
+
+
+def generations_to(search, k, max_generations):
+    """
+    Returns the number of generations after which k combinations qualified, or None when they never did.
+    """
+    hall_of_fame = HallOfFame(capacity=k, threshold=0.93)
+    evolution = CompactEvolution(
+        limits=search.limits,
+        population_fitness=search.batch_fitness.evaluate,
+        rng=search.rng,
+        incremental=search.incremental_fitness
+    )
+
+    for generation, (population, scores) in enumerate(
+            evolution.generations(size=search.size, generation=max_generations, seeds=search.seeds), start=1):
+        hall_of_fame.offer(population.tolist(), scores)
+        if len(hall_of_fame) >= k:
+            return generation
+
+    return None
+
+
+def unseeded(entry, requirements, seed):
+    """
+    A search that may start from warm starts, since seeded searches never do, with a generator seeded for the trial.
+    """
+    search = app.RecommendationSearch(entry, requirements)
+    search.rng = numpy.random.default_rng(seed)
+    return search
+
+
+def summary(runs):
+    reached = [generations for generations in runs if generations is not None]
+    return {
+        "reached": len(reached),
+        "median_generations": statistics.median(reached) if reached else None,
+        "mean_generations": statistics.mean(reached) if reached else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--types", type=int, default=6)
+    parser.add_argument("--products", type=int, default=60)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--max-generations", type=int, default=200)
+    parser.add_argument("--prime", type=int, default=3, help="Searches run before the warm request.")
+    parser.add_argument("--ratio", type=float, default=app.WARM_START_RATIO, help="The share of seeded genomes.")
+    arguments = parser.parse_args()
+
+    app.WARM_START_RATIO = arguments.ratio
+    requirements = make_requirements(arguments.types)
+    cold, warm, seeded = [], [], []
+
+    for trial in range(arguments.trials):
+        catalog = make_catalog(arguments.types, arguments.products, seed=trial)
+        entry = CatalogEntry("benchmark-%d" % trial, ProductListConverter(products=catalog).convert_to_dictionary())
+        app.warm_starts.genomes.clear()
+
+        cold.append(generations_to(unseeded(entry, requirements, 1000 + trial), arguments.k, arguments.max_generations))
+
+        for prime in range(arguments.prime):
+            unseeded(entry, requirements, trial * arguments.prime + prime).pool(size=12)
+        search = unseeded(entry, requirements, 1000 + trial)
+        seeded.append(len(search.seeds))
+        warm.append(generations_to(search, arguments.k, arguments.max_generations))
+
+    print(json.dumps({
+        "trials": arguments.trials,
+        "k": arguments.k,
+        "ratio": arguments.ratio,
+        "mean_seeds": statistics.mean(seeded),
+        "cold": summary(cold),
+        "warm": summary(warm),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,62 +4,169 @@ Description: This module contains the main Flask application for processing arch
 
 Contents:
 - index: Flask route for processing product validations and returning a JSON response.
+- generate: Flask route returning the recommended product combinations of a brand.
+- generate_stream: Flask route streaming recommendations as newline delimited JSON.
+- generate_batch: Flask route running several requirement sets against one catalog load.
+- submit_job, get_job: Flask routes running a search in the background and polling its result.
+- metrics: Flask route exposing Prometheus metrics.
 
 Note: index function has no args. It uses request.json
 
 """
 import os
+import hashlib
 import logging
+import queue
+import random
+import threading
+import time
 import uuid
-from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, partial
 
+import numpy
 from flask import Flask, json, request, jsonify
 from flask_cors import CORS
-from methods.genetic import Genome, Population, Crossover, Mutation
-from methods.colorsimilarity import Color, ColorFeatureExtractor, ColorGrayScaleIdentifier, HueScore, SaturationScore, \
-    ValueScore
+from methods.genetic import HallOfFame
+from methods.batchfitness import BatchFitness, IncrementalFitness
+from methods.colorsimilarity import HueScore, SaturationScore, ValueScore, exceeds
+from methods.compact import CompactEvolution
+from methods.island import IslandModel
+from methods.pricing import PriceBounds
+from methods.search import ExactSearch
+from methods.stopping import StoppingCriteria, evolution_parameters
+from cache import ResultCache, WarmStartStore
+from jobs import JobExecutor, JobStore, Saturated
+from serialization import JSONProvider, ProductTable, dumps, full_recommendation, parse_fields
+from metrics import (
+    FITNESS_EVALUATIONS,
+    GA_STOPS,
+    GENERATIONS,
+    cache_gauges,
+    executor_gauges,
+    registry,
+    server_timing,
+    stage
+)
 from database import (
     require_key,
-    Products,
+    catalog_cache,
+    FeatureSubset,
+    firestore_client,
+    key_validator,
     GenomeLimitCalculator,
-    ProductListConverter,
     ProductFilter,
+    ProductSubset,
     GenomeToProduct, SimilarityChecker
 )
 
 app = Flask(__name__)
+# jsonify() and flask.json encode with serialization.dumps, as the compact and ASGI responses do.
+app.json = JSONProvider(app)
 CORS(app)
 
+# Search spaces up to this many combinations are enumerated exactly when the time budget allows.
+EXACT_SEARCH_MAX_SPACE = int(os.environ.get("EXACT_SEARCH_MAX_SPACE", 200000))
+SEARCH_TIME_BUDGET = float(os.environ.get("SEARCH_TIME_BUDGET", 0.5))
+# More than one worker evolves that many islands in a process pool instead of one population.
+ISLAND_WORKERS = int(os.environ.get("ISLAND_WORKERS", 1))
+ISLAND_MIGRATION_INTERVAL = int(os.environ.get("ISLAND_MIGRATION_INTERVAL", 4))
+# Every search stops evolving GA_TIME_BUDGET seconds after it started, or when the best score
+# has not improved for GA_PATIENCE generations, or when 12 distinct combinations qualify.
+GA_TIME_BUDGET = float(os.environ.get("GA_TIME_BUDGET", 2.0))
+GA_PATIENCE = int(os.environ.get("GA_PATIENCE", 6))
+# Population size and generations grow with the search space up to these maximums.
+GA_MAX_POPULATION = int(os.environ.get("GA_MAX_POPULATION", 48))
+GA_MAX_GENERATIONS = int(os.environ.get("GA_MAX_GENERATIONS", 48))
+# Offspring are scored from their parents' totals from this many product types on, where it beats full scoring.
+INCREMENTAL_MIN_TYPES = int(os.environ.get("INCREMENTAL_MIN_TYPES", 6))
+# Searches of one /generate/batch request run concurrently on this shared pool.
+BATCH_MAX_PAYLOADS = int(os.environ.get("BATCH_MAX_PAYLOADS", 20))
+batch_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("BATCH_WORKERS", 4)))
+# Searches run on SEARCH_WORKERS threads, off the request threads. Up to SEARCH_QUEUE more wait for
+# a worker, and requests beyond that are refused at once with a 429 and a Retry-After header.
+search_executor = JobExecutor(
+    workers=int(os.environ.get("SEARCH_WORKERS", 2)),
+    max_queue=int(os.environ.get("SEARCH_QUEUE", 16))
+)
+# Jobs submitted to /jobs are kept JOB_TTL seconds after they were submitted or finished.
+job_store = JobStore(
+    max_size=int(os.environ.get("JOB_STORE_SIZE", 1024)),
+    ttl=float(os.environ.get("JOB_TTL", 600))
+)
+# Identical searches within RESULT_CACHE_TTL seconds are answered from this cache.
+RESULT_CACHE_POOL = int(os.environ.get("RESULT_CACHE_POOL", 12))
+result_cache = ResultCache(
+    max_size=int(os.environ.get("RESULT_CACHE_SIZE", 512)),
+    ttl=float(os.environ.get("RESULT_CACHE_TTL", 60))
+)
+# Up to this share of every initial population is seeded with genomes that qualified for the same
+# brand and requested types within WARM_START_TTL seconds, the rest being random.
+WARM_START_RATIO = float(os.environ.get("WARM_START_RATIO", 0.25))
+warm_starts = WarmStartStore(
+    max_size=int(os.environ.get("WARM_START_SIZE", 1024)),
+    ttl=float(os.environ.get("WARM_START_TTL", 3600))
+)
+# Every response carries a Server-Timing header when this is on, otherwise only requests sending "timing: true".
+TIMING_HEADER = os.environ.get("TIMING_HEADER", "false").lower() == "true"
+# Comma separated brands whose catalogs every worker loads in the background as it starts.
+WARMUP_BRANDS = [brand.strip() for brand in os.environ.get("WARMUP_BRANDS", "").split(",") if brand.strip()]
+
+cache_gauges({
+    "catalog": lambda: catalog_cache.entries,
+    "api_key": lambda: key_validator.keys,
+    "result": lambda: result_cache.results,
+    "warm_start": lambda: warm_starts.genomes,
+})
+executor_gauges(search_executor)
+
+
+def warm_up(brands):
+    """
+    Connects to Firestore and loads the catalogs of brands, so the first requests find them cached.
 
-def fitness(genome, products):
-    colors = []
+    Failures are logged and never stop the worker.
+
+    Args:
+        brands (list): The brands to preload.
+    """
+    started = time.perf_counter()
+
+    try:
+        firestore_client()
+
+        for brand in brands:
+            try:
+                with stage("warm_up"):
+                    catalog_cache.get(brand)
+            except Exception as e:
+                logging.exception("Warm-up of brand %s failed: %s", brand, str(e))
+
+    except Exception as e:
+        logging.exception("Warm-up failed: %s", str(e))
+
+    logging.info("Warm-up of %d brands took %.3fs", len(brands), time.perf_counter() - started)
+
+
+if WARMUP_BRANDS:
+    threading.Thread(target=warm_up, args=(WARMUP_BRANDS,), name="warm-up", daemon=True).start()
+
+
+def fitness(genome, products, features):
     c_score = 0
     g_score = 0
-    for index, product in enumerate(
-            GenomeToProduct(
-                genome=genome,
-                products=products
-            ).get_products_by_genome().values()):
-        colors.append(product['color'][0])
-
-    colors = [Color(color).hex() for color in colors]
-    gray_colors = [
-        gray_color for gray_color in colors if
-        ColorGrayScaleIdentifier(color=gray_color).is_gray(threshold=12)
-    ]
-
-    colored_colors = [
-        colored_color for colored_color in colors if
-        not ColorGrayScaleIdentifier(color=colored_color).is_gray(threshold=12)
-    ]
+    profiles = features.get_profiles_by_genome(genome=genome, product_types=products)
+
+    gray_colors = [profile for profile in profiles if profile.is_gray]
+    colored_colors = [profile for profile in profiles if not profile.is_gray]
 
     if len(gray_colors) > 1:
-        gray_hsv_features = [ColorFeatureExtractor(gray_color).hue() for gray_color in gray_colors]
+        gray_hsv_features = [gray_color.hue() for gray_color in gray_colors]
         g_hue_similarity_score = HueScore(gray_hsv_features).calculate()
         g_saturation_similarity_score = SaturationScore(gray_hsv_features).calculate()
         # c_value_similarity_score = ValueScore(colored_hsv_features).calculate()
 
-        if g_hue_similarity_score > 0.20 and g_saturation_similarity_score > 0.60:
+        if exceeds(g_hue_similarity_score, 0.20) and exceeds(g_saturation_similarity_score, 0.60):
             g_score += g_hue_similarity_score
 
         else:
@@ -71,12 +178,12 @@ def fitness(genome, products):
         # TODO: Compare saturation and value of the colored and gray colors.
 
     if len(colored_colors) > 1:
-        colored_hsv_features = [ColorFeatureExtractor(colored_color).hue() for colored_color in colored_colors]
+        colored_hsv_features = [colored_color.hue() for colored_color in colored_colors]
         c_hue_similarity_score = HueScore(colored_hsv_features).calculate()
         c_saturation_similarity_score = SaturationScore(colored_hsv_features).calculate()
         # c_value_similarity_score = ValueScore(colored_hsv_features).calculate()
 
-        if c_hue_similarity_score > 0.95 and c_saturation_similarity_score > 0.40:
+        if exceeds(c_hue_similarity_score, 0.95) and exceeds(c_saturation_similarity_score, 0.40):
             c_score += c_hue_similarity_score
 
         else:
@@ -90,40 +197,472 @@ def fitness(genome, products):
     total_scores = g_score + c_score
 
     # Keep middle
-    if total_scores / 2 > 0.45:
+    if exceeds(total_scores / 2, 0.45):
         return total_scores / 2
     else:
         return 0.0
 
 
-def run_evolution(limits, size, generation, fitness):
-    population = Genome(limits).make_population(size)
+class RecommendationSearch:
+    """
+    The search state of one requirement set against a loaded brand catalog.
+
+    Holds the requested products, their genome limits and the vectorized fitness engine.
+    The fitness engine is only built when a search actually runs, not for results served
+    from the result cache.
+
+    The time budget starts when pool() or stream() starts, after any wait for a search
+    worker, and bounds the exact search and every evolution run of the request.
+
+    With a minimum or maximum total price, the products of every type are ordered by
+    cost and trimmed to those that fit in some combination within the bounds, so the
+    search only explores feasible regions.
+
+    Qualifying genomes are kept in the warm-start store, and later evolutions of the
+    same brand and requested types without a seed start from some of them.
+    """
+
+    def __init__(self, catalog, requirements, seed=None, time_budget=None, min_price=None, max_price=None):
+        self.catalog = catalog
+        self.requirements = requirements
+        # One seeded generator per request drives the compact GA, so a given seed is reproducible.
+        self.seed = seed
+        self.rng = numpy.random.default_rng(seed)
+        self.min_price = min_price
+        self.max_price = max_price
+        self.products = ProductFilter(
+            requested_product_types=requirements,
+            products=catalog.products
+        ).find_requested_products_by_types()
+        self.features = catalog.features
+        self.orders = None
+        self.price_bounds = None
+
+        if min_price is not None or max_price is not None:
+            self.restrict_prices()
+
+        limit_calculator = GenomeLimitCalculator(product_dict=self.products)
+        self.limits = limit_calculator.calculate_genome_limits()
+        self.size, self.generation = evolution_parameters(
+            limit_calculator.calculate_search_space(),
+            max_size=GA_MAX_POPULATION,
+            max_generation=GA_MAX_GENERATIONS
+        )
+        self.time_budget = GA_TIME_BUDGET if time_budget is None else time_budget
+        self.stopping = StoppingCriteria(
+            deadline=time.monotonic() + self.time_budget,
+            patience=GA_PATIENCE,
+            target=12
+        )
+
+    def restrict_prices(self):
+        """
+        Orders the products of every type by cost and keeps those that fit the price bounds.
+
+        The cost of a product is its price times the value of the requirement at the same
+        position, as in the price of a recommendation. Products without a price are dropped.
+        """
+        orders, costs = {}, []
+
+        for position, key in enumerate(self.products):
+            order, prices = self.catalog.price_index(key)
+            value = float(self.requirements[position]["value"])
+            if value < 0:
+                order, prices = order[::-1], prices[::-1]
+            orders[key] = order
+            costs.append(prices * value)
+
+        bounds = PriceBounds(costs, min_price=self.min_price, max_price=self.max_price)
+        ranges = bounds.ranges()
+
+        orders = {key: orders[key][start:stop] for key, (start, stop) in zip(self.products, ranges)}
+        self.products = {key: ProductSubset(products=self.products[key], order=orders[key]) for key in self.products}
+        self.features = FeatureSubset(features=self.features, orders=orders)
+        self.orders = orders
+        self.price_bounds = bounds.trim(ranges)
+
+    def feasible(self, genome):
+        return self.price_bounds is None or bool(self.price_bounds.feasible([genome])[0])
+
+    @cached_property
+    def genes(self):
+        """
+        Maps the product ids of every requested type to their gene.
+        """
+        genes = {}
+
+        for key in self.products:
+            ids, _ = self.catalog.id_index(key)
+            order = range(len(ids)) if self.orders is None else self.orders[key]
+            genes[key] = {ids[int(position)]: gene for gene, position in enumerate(order)}
+
+        return genes
+
+    def encode(self, genome):
+        """
+        Names the products of a genome, as stored by the warm-start store.
+
+        Returns:
+            tuple: (product type, product id) pairs.
+        """
+        encoded = []
+
+        for key, gene in zip(self.products, genome):
+            ids, _ = self.catalog.id_index(key)
+            encoded.append((key, ids[int(gene if self.orders is None else self.orders[key][gene])]))
+
+        return tuple(encoded)
+
+    @cached_property
+    def warm_start_key(self):
+        return WarmStartStore.key(self.catalog.brand, self.requirements)
+
+    @cached_property
+    def seeds(self):
+        """
+        The stored genomes whose products are all still searched, at most WARM_START_RATIO of a population.
+
+        A request with a seed starts from random genomes only, so the same seed always
+        gives the same results whatever other requests stored.
+        """
+        if self.seed is not None:
+            return []
+
+        count = int(self.size * WARM_START_RATIO)
+        seeds = []
+
+        for stored in warm_starts.get(self.warm_start_key):
+            if len(seeds) >= count:
+                break
+            ids = dict(stored)
+            genome = [self.genes[key].get(ids.get(key)) for key in self.products]
+            if None not in genome:
+                seeds.append(genome)
+
+        return seeds
+
+    def remember(self, genomes):
+        warm_starts.add(self.warm_start_key, [self.encode(genome) for genome in genomes])
+
+    @cached_property
+    def batch_fitness(self):
+        return BatchFitness(products=self.products, features=self.features)
+
+    @cached_property
+    def incremental_fitness(self):
+        if len(self.limits) < INCREMENTAL_MIN_TYPES:
+            return None
+        return IncrementalFitness(batch_fitness=self.batch_fitness)
+
+
+    def exact(self, size):
+        """
+        Scores every combination when the search space is small and keeps the best in a hall of fame.
+
+        The hall of fame holds the whole exact pool, 16 genomes per requested combination
+        and at least 256, so distinct() picks from every kept genome. Genomes are not
+        materialized when they are admitted.
+
+        Args:
+            size (int): The number of distinct combinations wanted.
+
+        Returns:
+            HallOfFame: The best combinations and their scores, or None when the exact search
+            does not fit the space limit or the time budget.
+        """
+        exact_search = ExactSearch(
+            limits=self.limits,
+            population_fitness=self.batch_fitness.evaluate,
+            feasible=self.price_bounds.feasible if self.price_bounds is not None else None
+        )
+
+        if exact_search.size() > EXACT_SEARCH_MAX_SPACE:
+            return None
+
+        hall_of_fame = HallOfFame(capacity=max(256, 16 * size), threshold=0.93)
+        candidates = exact_search.run(
+            threshold=0.93,
+            pool_size=hall_of_fame.capacity,
+            time_budget=min(SEARCH_TIME_BUDGET, self.stopping.remaining()),
+            hall_of_fame=hall_of_fame
+        )
+        FITNESS_EVALUATIONS.inc(exact_search.evaluated)
+
+        return hall_of_fame if candidates is not None else None
+
+    def evolve(self, hall_of_fame):
+        """
+        Finds combinations by evolution, on islands when ISLAND_WORKERS is above one.
+
+        Every ranked generation is offered to the hall of fame. A single population stops
+        at the first generation meeting a stopping criterion. Islands only stop at the
+        deadline, and searches with price bounds always evolve a single population. Both
+        start from the warm-start seeds, and islands are seeded from the request generator,
+        so a seeded request gives the same results on islands too.
+
+        Args:
+            hall_of_fame (HallOfFame): Receives the best genomes of every generation.
+        """
+        if ISLAND_WORKERS > 1 and self.price_bounds is None:
+            island_model = IslandModel(
+                limits=self.limits,
+                population_fitness=self.batch_fitness,
+                workers=ISLAND_WORKERS,
+                migration_interval=ISLAND_MIGRATION_INTERVAL,
+                key="%s:%s:%s" % (self.catalog.brand, self.catalog.version, ",".join(self.products))
+            )
+            island_model.run(
+                size=self.size,
+                generation=self.generation,
+                deadline=self.stopping.deadline,
+                hall_of_fame=hall_of_fame,
+                seed=int(self.rng.integers(2 ** 32)),
+                seeds=self.seeds
+            )
+            GENERATIONS.inc(island_model.generations_run)
+            # Workers score one population per generation.
+            FITNESS_EVALUATIONS.inc(island_model.generations_run * self.size)
+            return
 
-    for i in range(generation):
-        population = sorted(
-            population,
-            key=lambda genome: fitness(genome=genome),
-            reverse=True
+        evolution = CompactEvolution(
+            limits=self.limits,
+            population_fitness=self.batch_fitness.evaluate,
+            rng=self.rng,
+            incremental=self.incremental_fitness,
+            constraint=self.price_bounds
         )
+        self.stopping.reset()
+
+        for population, scores in evolution.generations(size=self.size, generation=self.generation, seeds=self.seeds):
+            GENERATIONS.inc()
+            population = population.tolist()
+            hall_of_fame.offer(population, scores)
+            if self.stopping.update(population, scores):
+                break
+
+        GA_STOPS.inc(reason=self.stopping.reason or "generations")
+        FITNESS_EVALUATIONS.inc(evolution.generations_run * self.size)
+
+        # A run that used all its generations ends with offspring that were never scored.
+        if self.stopping.reason is None:
+            offspring = [genome for genome in evolution.population.tolist() if self.feasible(genome)]
+            if offspring:
+                FITNESS_EVALUATIONS.inc(len(offspring))
+                for genome, score in zip(offspring, self.batch_fitness.evaluate(offspring)):
+                    hall_of_fame.add(genome, score)
+
+    def start(self):
+        """
+        Restarts the time budget, so time spent queued for a worker does not shorten the search.
+        """
+        self.stopping.deadline = time.monotonic() + self.time_budget
+
+    def pool(self, size=12):
+        """
+        Collects up to size distinct qualifying combinations.
+
+        The evolution runs feed one hall of fame, whose genomes come with their products
+        and price, so results are never scored or materialized again. Only the distinct
+        combinations of an exact search are materialized. One evolution finds at most 12
+        genomes, so larger pools run it several times. No further run starts after the
+        deadline.
+
+        Args:
+            size (int): The maximum number of combinations returned.
+
+        Returns:
+            list: (genome, score, (products, price)) tuples scoring above 0.93, best first.
+        """
+        self.start()
+        hall_of_fame = self.exact(size)
+
+        if hall_of_fame is None:
+            hall_of_fame = HallOfFame(capacity=4 * size, threshold=0.93, materialize=self.materialize)
+            for run in range(max(1, -(-size // 12))):
+                if run and self.stopping.expired():
+                    break
+                self.evolve(hall_of_fame)
+
+        combinations = [
+            (genome, score, self.materialize(genome) if data is None else data)
+            for genome, score, data in self.distinct(hall_of_fame.best())[:size]
+        ]
+        self.remember([genome for genome, score, data in combinations])
+
+        return combinations
+
+    @staticmethod
+    def distinct(combinations):
+        """
+        Drops every combination similar to a better one, as SimilarityChecker.remove_similar_lists(threshold=3).
 
-        if fitness(genome=population[0]) == 0:
-            break
+        Args:
+            combinations (list): (genome, score, data) tuples, best first.
 
-        next_generation = population[0:2]
+        Returns:
+            list: The distinct combinations, best first.
+        """
+        if not combinations:
+            return []
 
-        for spring in range(int(len(population) / 2) - 1):
-            parents = Population(population=population).select(fitness_function=fitness)
-            offspring_a, offspring_b = Crossover(parents[0], parents[1]).single_point_crossover()
-            offspring_a = Mutation(genome=offspring_b, limits=limits).make_linear_mutation()
-            offspring_b = Mutation(genome=offspring_b, limits=limits).make_linear_mutation()
+        by_genome = {tuple(combination[0]): combination for combination in combinations}
+        kept = SimilarityChecker([genome for genome, score, data in combinations]).remove_similar_lists(threshold=3)
+        return [by_genome[tuple(genome)] for genome in kept]
 
-            next_generation += [offspring_a, offspring_b]
+    def stream(self):
+        """
+        Yields every genome as soon as it first passes the score threshold.
 
-        population = next_generation
+        A genome is skipped when it is similar to one already yielded, using the same
+        rule as SimilarityChecker.remove_similar_lists(threshold=3).
 
-    population = SimilarityChecker(population).remove_similar_lists(threshold=3)
+        Yields:
+            tuple: A genome and its score.
+        """
+        found = []
 
-    return population
+        def is_new(genome):
+            return all(SimilarityChecker.calculate_similarity(genome, existing) < 3 for existing in found)
+
+        self.start()
+        hall_of_fame = self.exact(12)
+        if hall_of_fame is not None:
+            combinations = self.distinct(hall_of_fame.best())[:12]
+            self.remember([genome for genome, score, data in combinations])
+            for genome, score, data in combinations:
+                yield genome, score
+            return
+
+        evolution = CompactEvolution(
+            limits=self.limits,
+            population_fitness=self.batch_fitness.evaluate,
+            rng=self.rng,
+            incremental=self.incremental_fitness,
+            constraint=self.price_bounds
+        )
+
+        self.stopping.reset()
+
+        for population, scores in evolution.generations(size=self.size, generation=self.generation, seeds=self.seeds):
+            GENERATIONS.inc()
+            population = population.tolist()
+
+            for genome, score in zip(population, scores.tolist()):
+                if score <= 0.93:
+                    break
+                if is_new(genome):
+                    found.append(genome)
+                    yield genome, score
+
+            if self.stopping.update(population, scores):
+                break
+
+        GA_STOPS.inc(reason=self.stopping.reason or "generations")
+        FITNESS_EVALUATIONS.inc(evolution.generations_run * self.size)
+
+        # The offspring of a run that used all its generations are scored here, as in evolve(). An
+        # early stop leaves the last ranked generation, already streamed above.
+        if self.stopping.reason is None:
+            offspring = [genome for genome in evolution.population.tolist() if self.feasible(genome)]
+            if offspring:
+                FITNESS_EVALUATIONS.inc(len(offspring))
+                for genome, score in zip(offspring, self.batch_fitness.evaluate(offspring).tolist()):
+                    if score > 0.93 and is_new(genome):
+                        found.append(genome)
+                        yield genome, score
+
+        self.remember(found)
+
+    def materialize(self, genome):
+        """
+        Looks up the products of a genome and prices them.
+
+        Returns:
+            tuple: The products by type and their total price.
+        """
+        products = GenomeToProduct(genome=genome, products=self.products).get_products_by_genome()
+        price = sum(
+            [(float(product['price']) * float(self.requirements[index]["value"])) for
+             index, product in enumerate(products.values())])
+
+        return products, price
+
+    def recommendation(self, genome, score, data=None):
+        products, price = self.materialize(genome) if data is None else data
+
+        return {
+            "id": str(uuid.uuid4()),
+            "products": products,
+            "score": score,
+            "price": price
+        }
+
+
+def find_combinations(brand, search):
+    """
+    Returns the qualifying combinations of a search, from the result cache when the same
+    brand, requirements and catalog version were searched recently.
+
+    With RESULT_CACHE_POOL above 12 a larger pool is cached and every response samples
+    12 combinations from it, so repeated requests still get some variety. Searches run
+    on the search executor, cached results are returned without taking a worker. A
+    search already on a worker never waits for the same search of another request.
+
+    Args:
+        brand (str): The brand of the catalog.
+        search (RecommendationSearch): The search of the requested requirement set.
+
+    Returns:
+        list: (genome, score, (products, price)) tuples, best first.
+
+    Raises:
+        Saturated: When the search executor is full.
+    """
+    # Requirement order is part of the key: prices pair products with requirements by position.
+    key = ResultCache.key(
+        brand, search.requirements, search.catalog.version, search.seed, search.min_price, search.max_price
+    )
+    # A search already on a worker, such as a job, computes its own pool instead of waiting for
+    # the same search of another request, which may be queued behind it for a worker.
+    pool = result_cache.get_or_compute(
+        key,
+        lambda: search_executor.call(search.pool, size=RESULT_CACHE_POOL),
+        wait=not search_executor.on_worker()
+    )
+
+    if len(pool) > 12:
+        return sorted(random.sample(pool, 12), key=lambda combination: combination[1], reverse=True)
+
+    return pool
+
+
+def response_format():
+    """
+    Reads the response format arguments of a request.
+
+    With ?format=compact recommendations name their products by id and the response
+    carries one products table shared by all of them, encoded with the fast JSON
+    encoder. ?fields=name,price keeps only these product fields, plus the id, in
+    either format.
+
+    Returns:
+        tuple: Whether the compact format was requested, and the product fields or None.
+    """
+    return request.args.get("format") == "compact", parse_fields(request.args.get("fields"))
+
+
+def json_response(value, status=200):
+    return app.response_class(response=dumps(value), status=status, mimetype='application/json')
+
+
+def busy_response(error):
+    response = app.response_class(
+        response=json.dumps({"error": "Too many searches are running. Please retry later."}),
+        status=429,
+        mimetype='application/json'
+    )
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
 
 
 @app.route('/generate', methods=['POST'])
@@ -142,49 +681,214 @@ def generate():
     try:
         # Get brand
         brand = request.headers['brand']
+        compact, fields = response_format()
 
-        # Get products by brand then filter by requested types.
-        products = Products(brand=brand).get_products_by_brand()
-        # Convert product list to single dict to calculate genome limits and filter products.
-        products_dict = ProductListConverter(products=products).convert_to_dictionary()
-        filtered_products = ProductFilter(
-            requested_product_types=request.get_json()["requirements"],
-            products=products_dict
-        ).find_requested_products_by_types()
+        # Get the converted catalog of the brand then filter by requested types.
+        # The cache converts the product list and parses every color once per catalog load.
+        with stage("catalog"):
+            catalog = catalog_cache.get(brand)
+
+        with stage("filter"):
+            search = RecommendationSearch(
+                catalog=catalog,
+                requirements=request.get_json()["requirements"],
+                seed=request.get_json().get("seed"),
+                min_price=request.get_json().get("min_price"),
+                max_price=request.get_json().get("max_price")
+            )
+
+        with stage("search"):
+            combinations = find_combinations(brand=brand, search=search)
+
+        recommendations = [
+            search.recommendation(genome=genome, score=score, data=data) for genome, score, data in combinations
+        ]
+
+        # print(recommendations)
+
+        # Return Results
+        with stage("serialize"):
+            if compact:
+                table = ProductTable(fields=fields)
+                recommendations = [table.compact(recommendation) for recommendation in recommendations]
+                return json_response({"recommendations": recommendations, "products": table.products})
+
+            return jsonify([full_recommendation(recommendation, fields) for recommendation in recommendations]), 200
 
-        genome_limits = GenomeLimitCalculator(product_dict=filtered_products).calculate_genome_limits()
+    except Saturated as e:
+        return busy_response(e)
 
-        fitness_func = partial(
-            fitness,
-            products=filtered_products,
+    except Exception as e:
+        # Log the exception
+        logging.exception("An error occurred while processing the request: %s", str(e))
+
+        # Continue the execution and return a response indicating a temporary issue
+        error_response = {
+            "error": "An unexpected error occurred. Please try again later."
+        }
+
+        return app.response_class(
+            response=json.dumps(error_response),
+            status=200,
+            mimetype='application/json'
         )
 
-        evaluated_combinations = run_evolution(limits=genome_limits, size=12, generation=16, fitness=fitness_func)
-        print(evaluated_combinations)
 
-        recommendations = []
-        for genome in evaluated_combinations:
+@app.route('/generate/stream', methods=['POST'])
+@require_key
+def generate_stream():
+    """
+    Streams recommendations as newline delimited JSON while they are found.
 
-            if fitness_func(genome=genome, products=filtered_products) > 0.93:
-                data = {
-                    "id": str(uuid.uuid4()),
-                    "products": GenomeToProduct(genome=genome, products=filtered_products).get_products_by_genome(),
-                    "score": fitness_func(genome=genome, products=filtered_products),
-                    "price": sum(
-                        [(float(product['price']) * float(request.get_json()["requirements"][index]["value"])) for
-                         index, product in enumerate(
-                            (GenomeToProduct(genome=genome,
-                                             products=filtered_products).get_products_by_genome().values()))])
+    Every line is {"recommendation": {...}} with the same fields as a /generate item,
+    and the last line is {"summary": {...}}. An error after the stream started is
+    sent as an {"error": ...} line.
 
-                }
+    The catalog is fetched before the search is handed to the search executor like
+    /generate, which passes its lines to the response through a queue. A 429 with a
+    Retry-After header is returned when the executor is full, and the search stops
+    when the response is closed.
 
-                recommendations.append(data)
+    Args:
+        There is no args.
 
-        # print(recommendations)
+    Returns:
+        flask.Response: An application/x-ndjson streaming response.
+    """
+    try:
+        brand = request.headers['brand']
+        payload = request.get_json()
 
-        # Return Results
+        # The catalog is fetched on the request thread so a search worker only runs the search.
+        search = RecommendationSearch(
+            catalog=catalog_cache.get(brand),
+            requirements=payload["requirements"],
+            seed=payload.get("seed"),
+            min_price=payload.get("min_price"),
+            max_price=payload.get("max_price")
+        )
+
+    except Exception as e:
+        logging.exception("An error occurred while processing the request: %s", str(e))
+        return app.response_class(
+            response=json.dumps({"error": "An unexpected error occurred. Please try again later."}),
+            status=200,
+            mimetype='application/json'
+        )
+
+    lines = queue.Queue()
+    closed = threading.Event()
+
+    def search_records():
+        # Lines are encoded as in a request, with the JSON settings of the app.
+        with app.app_context():
+            try:
+                count = 0
+
+                for genome, score in search.stream():
+                    if closed.is_set():
+                        return
+                    count += 1
+                    lines.put(json.dumps({"recommendation": search.recommendation(genome=genome, score=score)}) + "\n")
+
+                lines.put(json.dumps({"summary": {"recommendations": count}}) + "\n")
+
+            except Exception as e:
+                logging.exception("An error occurred while streaming the request: %s", str(e))
+                lines.put(json.dumps({"error": "An unexpected error occurred. Please try again later."}) + "\n")
+
+            finally:
+                lines.put(None)
+
+    try:
+        search_executor.submit(search_records)
+    except Saturated as e:
+        return busy_response(e)
+
+    response = app.response_class(iter(lines.get, None), status=200, mimetype='application/x-ndjson')
+    # The server closes the response when the client goes away, even if no line was read yet.
+    response.call_on_close(closed.set)
+    return response
+
+
+def find_recommendations(brand, catalog, payload):
+    try:
+        search = RecommendationSearch(
+            catalog=catalog,
+            requirements=payload["requirements"],
+            seed=payload.get("seed"),
+            min_price=payload.get("min_price"),
+            max_price=payload.get("max_price")
+        )
+
+        with stage("search"):
+            combinations = find_combinations(brand=brand, search=search)
+
+        return {
+            "recommendations": [
+                search.recommendation(genome=genome, score=score, data=data) for genome, score, data in combinations
+            ]
+        }
+
+    except Saturated as e:
+        return {"error": "Too many searches are running. Please retry later.", "retry_after": e.retry_after}
+
+    except Exception as e:
+        logging.exception("An error occurred while processing a batch payload: %s", str(e))
+        return {"error": "An unexpected error occurred. Please try again later."}
+
+
+@app.route('/generate/batch', methods=['POST'])
+@require_key
+def generate_batch():
+    """
+    Runs several requirement sets of one brand, authenticating and loading the catalog once.
+
+    The body is {"payloads": [{"requirements": [...]}, ...]}. The response holds one
+    {"recommendations": [...]} or {"error": ...} item per payload, in the same order.
+    With ?format=compact it is {"results": [...], "products": {...}}, one products
+    table for all payloads.
+
+    Args:
+        There is no args.
+
+    Returns:
+        flask.Response: A JSON list with the result of every payload.
+    """
+
+    try:
+        brand = request.headers['brand']
+        payloads = request.get_json()["payloads"]
+        compact, fields = response_format()
+
+        if len(payloads) > BATCH_MAX_PAYLOADS:
+            return app.response_class(
+                response=json.dumps({"error": "A batch accepts at most %d payloads." % BATCH_MAX_PAYLOADS}),
+                status=400,
+                mimetype='application/json'
+            )
 
-        return jsonify(recommendations), 200
+        with stage("catalog"):
+            catalog = catalog_cache.get(brand)
+
+        results = list(batch_executor.map(partial(find_recommendations, brand, catalog), payloads))
+
+        with stage("serialize"):
+            if compact:
+                table = ProductTable(fields=fields)
+                results = [
+                    {"recommendations": [table.compact(recommendation) for recommendation in result["recommendations"]]}
+                    if "recommendations" in result else result
+                    for result in results
+                ]
+                return json_response({"results": results, "products": table.products})
+
+            results = [
+                {"recommendations": [full_recommendation(item, fields) for item in result["recommendations"]]}
+                if "recommendations" in result else result
+                for result in results
+            ]
+            return jsonify(results), 200
 
     except Exception as e:
         # Log the exception
@@ -202,6 +906,125 @@ def generate():
         )
 
 
+def job_owner():
+    return hashlib.sha256(request.headers.get("secret-key", "").encode("utf-8")).hexdigest()
+
+
+def run_job(brand, payload):
+    with stage("catalog"):
+        catalog = catalog_cache.get(brand)
+
+    return find_recommendations(brand, catalog, payload)
+
+
+@app.route('/jobs', methods=['POST'])
+@require_key
+def submit_job():
+    """
+    Submits a search in the background for callers that can wait.
+
+    The body is a /generate body. The 202 response holds the job id, to poll with
+    GET /jobs/<id>. A 429 with a Retry-After header is returned when the search
+    executor is full.
+
+    Args:
+        There is no args.
+
+    Returns:
+        flask.Response: The id and status of the job.
+    """
+
+    try:
+        brand = request.headers['brand']
+        payload = request.get_json()
+        job = job_store.submit(search_executor, job_owner(), run_job, brand, payload)
+
+        response = json_response({"id": job.id, "status": job.status}, status=202)
+        response.headers["Location"] = "/jobs/%s" % job.id
+        return response
+
+    except Saturated as e:
+        return busy_response(e)
+
+    except Exception as e:
+        # Log the exception
+        logging.exception("An error occurred while processing the request: %s", str(e))
+
+        # Continue the execution and return a response indicating a temporary issue
+        error_response = {
+            "error": "An unexpected error occurred. Please try again later."
+        }
+
+        return app.response_class(
+            response=json.dumps(error_response),
+            status=200,
+            mimetype='application/json'
+        )
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+@require_key
+def get_job(job_id):
+    """
+    Polls a job submitted with the same API key.
+
+    The status is "queued", "running", "done" or "failed". A done job carries the
+    {"recommendations": [...]} or {"error": ...} result of a /generate/batch payload,
+    and ?format=compact and ?fields= apply to it as to /generate.
+
+    Args:
+        job_id (str): The id returned by POST /jobs.
+
+    Returns:
+        flask.Response: The job, or a 404 when it is unknown or expired.
+    """
+    job = job_store.get(job_id, job_owner())
+
+    if job is None:
+        return json_response({"error": "Unknown job"}, status=404)
+
+    body = job.to_dict()
+    result = body.get("result")
+
+    if result is not None and "recommendations" in result:
+        compact, fields = response_format()
+        if compact:
+            table = ProductTable(fields=fields)
+            recommendations = [table.compact(recommendation) for recommendation in result["recommendations"]]
+            body["result"] = {"recommendations": recommendations, "products": table.products}
+        else:
+            body["result"] = {
+                "recommendations": [full_recommendation(item, fields) for item in result["recommendations"]]
+            }
+
+    return json_response(body)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Exposes stage timings, GA counters and cache hit ratios in the Prometheus text format.
+
+    Args:
+        There is no args.
+
+    Returns:
+        flask.Response: The metrics as text/plain.
+    """
+    return app.response_class(
+        response=registry.render(),
+        status=200,
+        mimetype='text/plain; version=0.0.4'
+    )
+
+
+@app.after_request
+def add_server_timing(response):
+    if TIMING_HEADER or request.headers.get("timing", "").lower() == "true":
+        response.headers["Server-Timing"] = server_timing()
+    return response
+
+
 @app.route('/', methods=['GET'])
 def index():
     """
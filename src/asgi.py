@@ -0,0 +1,189 @@
+"""
+Module: asgi.py
+Description: The asyncio serving mode of the app, for an ASGI server such as uvicorn.
+
+Contents:
+- AsyncApp: ASGI application serving / and /generate on the event loop and every other route through the Flask app.
+- application: The AsyncApp reading from Firestore.
+
+Run with: uvicorn asgi:application --host 0.0.0.0 --port 8080
+
+In /generate the API key validation and the catalog fetch run concurrently on the event
+loop instead of one after the other, and the search runs on a worker thread. The
+catalog and key caches are those of the Flask app, so both modes share them.
+"""
+import asyncio
+import json
+import logging
+from functools import partial
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app, RecommendationSearch, find_combinations
+from database import AsyncCatalogCache, AsyncFirestoreBackend, AsyncKeyValidator, catalog_cache, key_validator
+from jobs import Saturated
+from metrics import stage
+from serialization import ProductTable, dumps, full_recommendation, parse_fields
+
+ERROR = {"error": "An unexpected error occurred. Please try again later."}
+
+
+async def read_body(receive):
+    body = b""
+    more_body = True
+
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+    return body
+
+
+async def respond(send, status, body, headers=()):
+    """
+    Sends a whole JSON response.
+
+    Args:
+        send (callable): The ASGI send function.
+        status (int): The HTTP status.
+        body: The JSON serializable response body.
+        headers (tuple): Extra (name, value) string headers.
+    """
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json")] + [
+            (name.encode("latin-1"), value.encode("latin-1")) for name, value in headers
+        ],
+    })
+    await send({"type": "http.response.body", "body": dumps(body)})
+
+
+class AsyncApp:
+    """
+    The ASGI application of the asyncio serving mode.
+
+    Attributes:
+        catalogs (AsyncCatalogCache): Loads catalogs through the asyncio backend.
+        keys (AsyncKeyValidator): Validates API keys through the asyncio backend.
+        fallback (WsgiToAsgi): The Flask app, serving every other route on worker threads.
+    """
+
+    def __init__(self, backend, wsgi_app=app):
+        """
+        Initializes an AsyncApp object.
+
+        Args:
+            backend: An asyncio data backend, such as AsyncFirestoreBackend or AsyncInMemoryBackend.
+            wsgi_app (flask.Flask): The app serving the other routes.
+        """
+        self.catalogs = AsyncCatalogCache(cache=catalog_cache, backend=backend)
+        self.keys = AsyncKeyValidator(validator=key_validator, backend=backend)
+        self.fallback = WsgiToAsgi(wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http" and scope["path"] == "/generate" and scope["method"] == "POST":
+            await self.generate(scope, receive, send)
+        elif scope["type"] == "http" and scope["path"] == "/" and scope["method"] == "GET":
+            await respond(send, 200, {"message": "First API"})
+        else:
+            await self.fallback(scope, receive, send)
+
+    @staticmethod
+    async def lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def generate(self, scope, receive, send):
+        """
+        Serves POST /generate like the Flask route, with the same body, headers and responses.
+
+        The catalog fetch starts together with the key validation and is cancelled when
+        the key turns out to be invalid. Only a request with a valid key converts and
+        caches the catalog.
+        """
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        secret_key = headers.get("secret-key")
+
+        if not secret_key:
+            await respond(send, 401, {"error": "Invalid API key"})
+            return
+
+        brand = headers.get("brand")
+        products = None
+
+        if brand is not None and self.catalogs.lookup(brand) is None:
+            # Only the fetch overlaps the key validation, the catalog is cached once the key is valid.
+            products = asyncio.ensure_future(self.catalogs.fetch(brand))
+            # A fetch left behind by an invalid key must not log an unretrieved exception.
+            products.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+        try:
+            with stage("validate_key"):
+                is_valid = await self.keys.validate_key(secret_key)
+
+            if not is_valid:
+                if products is not None:
+                    products.cancel()
+                await respond(send, 401, {"error": "Invalid API key"})
+                return
+
+            if brand is None:
+                raise KeyError("brand")
+
+            with stage("catalog"):
+                catalog = await self.catalogs.get(brand, products=products)
+
+            payload = json.loads(await read_body(receive))
+            recommendations = await asyncio.get_running_loop().run_in_executor(
+                None, partial(self.recommend, brand, catalog, payload)
+            )
+
+            query = parse_qs(scope["query_string"].decode("latin-1"))
+            fields = parse_fields(query.get("fields", [None])[0])
+
+            with stage("serialize"):
+                if query.get("format", [None])[0] == "compact":
+                    table = ProductTable(fields=fields)
+                    recommendations = [table.compact(recommendation) for recommendation in recommendations]
+                    await respond(send, 200, {"recommendations": recommendations, "products": table.products})
+                else:
+                    await respond(send, 200, [full_recommendation(item, fields) for item in recommendations])
+
+        except Saturated as e:
+            await respond(send, 429, {"error": "Too many searches are running. Please retry later."},
+                          headers=[("retry-after", str(e.retry_after))])
+
+        except Exception as e:
+            if products is not None:
+                products.cancel()
+            logging.exception("An error occurred while processing the request: %s", str(e))
+            await respond(send, 200, ERROR)
+
+    @staticmethod
+    def recommend(brand, catalog, payload):
+        with stage("filter"):
+            search = RecommendationSearch(
+                catalog=catalog,
+                requirements=payload["requirements"],
+                seed=payload.get("seed"),
+                min_price=payload.get("min_price"),
+                max_price=payload.get("max_price")
+            )
+
+        with stage("search"):
+            combinations = find_combinations(brand=brand, search=search)
+
+        return [search.recommendation(genome=genome, score=score, data=data) for genome, score, data in combinations]
+
+
+application = AsyncApp(backend=AsyncFirestoreBackend())
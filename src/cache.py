@@ -0,0 +1,330 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries also expire after a time to live.
+
+    Attributes:
+        max_size (int): The maximum number of entries kept before the least recently used is evicted.
+        ttl (float): The default time to live of an entry, in seconds.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that found no live entry.
+    """
+
+    def __init__(self, max_size=128, ttl=60.0, clock=time.monotonic):
+        """
+        Initializes a TTLCache object.
+
+        Args:
+            max_size (int): The maximum number of entries.
+            ttl (float): The default time to live of an entry, in seconds.
+            clock (callable): The monotonic clock used for expiry, replaceable in tests.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the live value of a key.
+
+        Args:
+            key (hashable): The cache key.
+            default: The value returned when the key is missing or expired.
+
+        Returns:
+            The cached value, or default.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[1] <= self.clock():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores a value, evicting the least recently used entries beyond max_size.
+
+        Args:
+            key (hashable): The cache key.
+            value: The value to store.
+            ttl (float): The time to live of this entry, defaults to the cache ttl.
+        """
+        expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """
+        Removes a key from the cache.
+
+        Args:
+            key (hashable): The cache key.
+            default: The value returned when the key is missing.
+
+        Returns:
+            The removed value, or default.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def hit_ratio(self):
+        """
+        Calculates the share of lookups answered from the cache.
+
+        Returns:
+            float: The hit ratio, 0.0 when nothing has been looked up yet.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[1] > self.clock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one call whose result every caller shares.
+
+    Attributes:
+        shared (int): The number of calls that waited for another caller instead of running.
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, wait=True):
+        """
+        Runs function for key unless a call for the same key is already running.
+
+        Args:
+            key (hashable): The key identifying the work.
+            function (callable): A function without arguments that does the work.
+            wait (bool): Whether to wait for a running call. Without waiting, the caller
+                runs function itself and shares its result with nobody.
+
+        Returns:
+            The result of the single running call. Its exception is raised to every caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self._calls[key] = Future()
+            elif wait:
+                self.shared += 1
+
+        if not leader:
+            return call.result() if wait else function()
+
+        try:
+            result = function()
+        except BaseException as error:
+            call.set_exception(error)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AsyncSingleFlight:
+    """
+    The SingleFlight of coroutines: concurrent awaits of one key share a single call.
+
+    The call is cancelled once every caller awaiting it was cancelled, so work nobody
+    waits for does not keep running.
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self._calls = {}
+        self._waiters = {}
+
+    async def do(self, key, function):
+        """
+        Awaits function() for key unless a call for the same key is already running.
+
+        Args:
+            key (hashable): The key identifying the work.
+            function (callable): A function without arguments returning a coroutine.
+
+        Returns:
+            The result of the single running call. Its exception is raised to every caller.
+        """
+        call = self._calls.get(key)
+
+        if call is None:
+            call = self._calls[key] = asyncio.ensure_future(function())
+            call.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            self.shared += 1
+
+        self._waiters[call] = self._waiters.get(call, 0) + 1
+        try:
+            return await asyncio.shield(call)
+        finally:
+            self._waiters[call] -= 1
+            if not self._waiters[call]:
+                del self._waiters[call]
+                if not call.done():
+                    self._forget(key, call)
+                    call.cancel()
+
+    def _forget(self, key, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+class ResultCache:
+    """
+    Caches computed results by key, computing concurrent misses of one key only once.
+
+    Attributes:
+        results (TTLCache): The LRU+TTL store of computed results.
+        flight (SingleFlight): Collapses concurrent computations of the same key.
+    """
+
+    def __init__(self, max_size=512, ttl=60.0):
+        """
+        Initializes a ResultCache object.
+
+        Args:
+            max_size (int): The maximum number of cached results.
+            ttl (float): The time to live of a result, in seconds.
+        """
+        self.results = TTLCache(max_size=max_size, ttl=ttl)
+        self.flight = SingleFlight()
+
+    @staticmethod
+    def key(*parts):
+        """
+        Builds a canonical key from JSON serializable parts. Dictionary key order does not matter.
+
+        Returns:
+            str: The SHA-256 hex digest of the parts.
+        """
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get_or_compute(self, key, compute, wait=True):
+        """
+        Returns the cached result of a key, computing and storing it on a miss.
+
+        Args:
+            key (str): The cache key.
+            compute (callable): A function without arguments returning the result.
+            wait (bool): Whether a miss waits for a computation of the same key that is
+                already running, or computes the result itself.
+
+        Returns:
+            The cached or computed result.
+        """
+        result = self.results.get(key)
+        if result is not None:
+            return result
+
+        return self.flight.do(key, lambda: self._compute(key, compute), wait=wait)
+
+    def _compute(self, key, compute):
+        result = compute()
+        self.results.set(key, result)
+        return result
+
+
+class WarmStartStore:
+    """
+    Recent high-scoring genomes of every brand and requirement set, best and newest first.
+
+    A genome is stored as (product type, product id) pairs rather than gene indexes, so
+    it still names the same products after the catalog is reloaded, reordered or
+    trimmed to price bounds.
+
+    Attributes:
+        genomes (TTLCache): The stored genomes of every key.
+        per_key (int): The maximum number of genomes kept per key.
+    """
+
+    def __init__(self, max_size=1024, per_key=24, ttl=3600.0):
+        """
+        Initializes a WarmStartStore object.
+
+        Args:
+            max_size (int): The maximum number of brand and requirement set keys.
+            per_key (int): The maximum number of genomes kept per key.
+            ttl (float): How long, in seconds, the genomes of a key are kept after their last update.
+        """
+        self.genomes = TTLCache(max_size=max_size, ttl=ttl)
+        self.per_key = per_key
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(brand, requirements):
+        """
+        Builds the key of a requirement set: the brand and the set of requested product types.
+        """
+        return ResultCache.key(brand, sorted(set(str(requirement["id"]) for requirement in requirements)))
+
+    def get(self, key):
+        """
+        Returns the stored genomes of a key.
+
+        Returns:
+            list: Genomes as tuples of (product type, product id) pairs, best and newest first.
+        """
+        return list(self.genomes.get(key, ()))
+
+    def add(self, key, genomes):
+        """
+        Puts genomes in front of the stored ones of a key, dropping duplicates and the oldest beyond per_key.
+
+        Args:
+            key (str): The requirement set key.
+            genomes (list): Genomes as tuples of (product type, product id) pairs, best first.
+        """
+        if not genomes:
+            return
+
+        with self._lock:
+            merged = dict.fromkeys([tuple(genome) for genome in genomes] + list(self.genomes.get(key, ())))
+            self.genomes.set(key, tuple(merged)[:self.per_key])
@@ -1,10 +1,68 @@
+import asyncio
+import hashlib
 import json
+import logging
+import os
+import threading
+from collections.abc import Sequence
 from functools import wraps
-import firebase_admin
-from firebase_admin import firestore
+import numpy as np
 from flask import request
+from cache import AsyncSingleFlight, SingleFlight, TTLCache
+from metrics import stage
+from methods.colorsimilarity import ColorProfile
+from snapshot import SnapshotStore
 
-default_app = firebase_admin.initialize_app()
+_firestore_client = None
+_async_firestore_client = None
+_firestore_lock = threading.Lock()
+
+
+def _initialize_firebase():
+    import firebase_admin
+
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        firebase_admin.initialize_app()
+
+
+def firestore_client():
+    """
+    Returns the Firestore client shared by the whole process.
+
+    Firebase is imported, initialized and connected on the first call instead of at import,
+    so cold starts do not pay for it before the first request and the module imports
+    offline. Concurrent first calls create a single client.
+    """
+    global _firestore_client
+
+    if _firestore_client is None:
+        with _firestore_lock:
+            if _firestore_client is None:
+                from firebase_admin import firestore
+
+                _initialize_firebase()
+                _firestore_client = firestore.client()
+
+    return _firestore_client
+
+
+def async_firestore_client():
+    """
+    Returns the asyncio Firestore client shared by the whole process, created like firestore_client().
+    """
+    global _async_firestore_client
+
+    if _async_firestore_client is None:
+        with _firestore_lock:
+            if _async_firestore_client is None:
+                from firebase_admin import firestore_async
+
+                _initialize_firebase()
+                _async_firestore_client = firestore_async.client()
+
+    return _async_firestore_client
 
 
 class Products:
@@ -12,7 +70,7 @@ class Products:
         self.brand = brand
 
     def get_products_by_brand(self):
-        return firestore.client().collection("products").document(self.brand).get().to_dict()['products']
+        return firestore_client().collection("products").document(self.brand).get().to_dict()['products']
 
 
 class GenomeToProduct:
@@ -28,6 +86,88 @@ class GenomeToProduct:
         return result
 
 
+class ProductFeatureIndex:
+    """
+    Color features of every product, keyed by (product type, product index).
+
+    Built once per catalog load so fitness only looks up precomputed numbers.
+    Products without a valid hex color have no entry and are left out of scoring.
+    """
+
+    def __init__(self, products, gray_threshold=12):
+        self.products = products
+        self.gray_threshold = gray_threshold
+        self.features = {}
+
+        for key, values in products.items():
+            for index, product in enumerate(values):
+                profile = ColorProfile.parse((product.get('color') or [None])[0], threshold=gray_threshold)
+                if profile is not None:
+                    self.features[(key, index)] = profile
+
+    def columns(self, key):
+        """
+        Returns the HSV, gray flag and has-a-color arrays of the products of one type.
+        """
+        count = len(self.products[key])
+        hsv = np.zeros((count, 3))
+        gray = np.zeros(count, dtype=bool)
+        known = np.zeros(count, dtype=bool)
+
+        for index in range(count):
+            profile = self.features.get((key, index))
+            if profile is not None:
+                hsv[index] = profile.hsv
+                gray[index] = profile.is_gray
+                known[index] = True
+
+        return hsv, gray, known
+
+    def get_profiles_by_genome(self, genome, product_types):
+        return [
+            self.features[(key, gene)] for key, gene in zip(product_types, genome)
+            if (key, gene) in self.features
+        ]
+
+
+class ProductSubset(Sequence):
+    """
+    Products of one type in a given order, read from the catalog list without copying it.
+    """
+
+    def __init__(self, products, order):
+        self.products = products
+        self.order = order
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        return self.products[int(self.order[index])]
+
+    def __len__(self):
+        return len(self.order)
+
+
+class FeatureSubset:
+    """
+    The features of ProductSubset lists: gene i of a type is product order[i] of the catalog.
+    """
+
+    def __init__(self, features, orders):
+        self.features = features
+        self.orders = orders
+
+    def columns(self, key):
+        return tuple(column[self.orders[key]] for column in self.features.columns(key))
+
+    def get_profiles_by_genome(self, genome, product_types):
+        genome = [
+            int(self.orders[key][gene]) if 0 <= gene < len(self.orders[key]) else -1
+            for key, gene in zip(product_types, genome)
+        ]
+        return self.features.get_profiles_by_genome(genome=genome, product_types=product_types)
+
+
 class ProductFilter:
     def __init__(self, requested_product_types, products):
         self.requested_product_types = requested_product_types
@@ -57,10 +197,17 @@ class GenomeLimitCalculator:
     def calculate_genome_limits(self):
         return [len(value) - 1 for value in self.product_dict.values()]
 
+    def calculate_search_space(self):
+        size = 1
+        for value in self.product_dict.values():
+            size *= len(value)
+        return size
+
 
 class KeyValidator:
-    def __init__(self):
-        self.db = firestore.client()
+    @property
+    def db(self):
+        return firestore_client()
 
     def validate_key(self, key):
         key_reference = self.db.collection("users").where("key", "==", key)
@@ -69,10 +216,432 @@ class KeyValidator:
         return results[0][0].value > 0
 
 
-key_validator = KeyValidator()
+class CachedKeyValidator:
+    """
+    Caches key validation results in front of a KeyValidator.
+
+    Valid keys are kept for ttl seconds and invalid keys for the shorter negative_ttl,
+    the least recently used key is evicted beyond max_size, and concurrent misses for
+    the same key share a single Firestore query. Call evict() when a key is revoked.
+    """
+
+    def __init__(self, validator, ttl=300.0, negative_ttl=10.0, max_size=1024):
+        self.validator = validator
+        self.negative_ttl = negative_ttl
+        self.keys = TTLCache(max_size=max_size, ttl=ttl)
+        self.flight = SingleFlight()
+
+    def validate_key(self, key):
+        is_valid = self.keys.get(key)
+        if is_valid is not None:
+            return is_valid
+
+        return self.flight.do(key, lambda: self._load(key))
+
+    def evict(self, key):
+        self.keys.pop(key)
+
+    def remember(self, key, is_valid):
+        self.keys.set(key, is_valid, ttl=None if is_valid else self.negative_ttl)
+        return is_valid
+
+    def _load(self, key):
+        return self.remember(key, self.validator.validate_key(key))
+
+
+key_validator = CachedKeyValidator(
+    validator=KeyValidator(),
+    ttl=float(os.environ.get("KEY_CACHE_TTL", 300)),
+    negative_ttl=float(os.environ.get("KEY_CACHE_NEGATIVE_TTL", 10)),
+    max_size=int(os.environ.get("KEY_CACHE_SIZE", 1024))
+)
+
+
+class FirestoreCatalogBackend:
+    """
+    Reads brand catalogs from the Firestore "products" collection.
+    """
+
+    def fetch(self, brand):
+        return Products(brand=brand).get_products_by_brand()
+
+    def watch(self, brand, callback):
+        """
+        Calls callback(brand) whenever the brand's products document changes.
+
+        Firestore delivers the current document as the first snapshot, which is
+        skipped because the catalog was just read. Returns the Firestore watch,
+        whose unsubscribe() stops listening.
+        """
+        initial_snapshot = threading.Event()
+
+        def on_snapshot(document_snapshots, changes, read_time):
+            if not initial_snapshot.is_set():
+                initial_snapshot.set()
+                return
+            callback(brand)
+
+        return firestore_client().collection("products").document(brand).on_snapshot(on_snapshot)
+
+
+class InMemoryCatalogBackend:
+    """
+    A catalog backend backed by a dictionary of brand to product list, for offline use and tests.
+    """
+
+    def __init__(self, catalogs=None):
+        self.catalogs = dict(catalogs or {})
+        self.fetch_count = 0
+        self._watchers = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, brand):
+        with self._lock:
+            self.fetch_count += 1
+            return self.catalogs[brand]
+
+    def set_products(self, brand, products):
+        """
+        Replaces a brand's products and notifies its watchers, like a Firestore document write.
+        """
+        with self._lock:
+            self.catalogs[brand] = products
+            callbacks = list(self._watchers.get(brand, []))
+
+        for callback in callbacks:
+            callback(brand)
+
+    def watch(self, brand, callback):
+        with self._lock:
+            self._watchers.setdefault(brand, []).append(callback)
+
+        return InMemoryWatch(backend=self, brand=brand, callback=callback)
+
+    def unwatch(self, brand, callback):
+        with self._lock:
+            if callback in self._watchers.get(brand, []):
+                self._watchers[brand].remove(callback)
+
+
+class InMemoryWatch:
+    def __init__(self, backend, brand, callback):
+        self.backend = backend
+        self.brand = brand
+        self.callback = callback
+
+    def unsubscribe(self):
+        self.backend.unwatch(brand=self.brand, callback=self.callback)
+
+
+class CatalogEntry:
+    """
+    A loaded brand catalog: the converted products dictionary, its color feature index
+    and a fingerprint of its content, used as the catalog version in result cache keys.
+
+    An entry mapped from a CatalogSnapshot has the snapshot's lazy product mapping and
+    feature columns instead.
+    """
+
+    def __init__(self, brand, products, features=None, version=None, prices=None, ids=None):
+        self.brand = brand
+        self.products = products
+        self.features = ProductFeatureIndex(products=products) if features is None else features
+        self.version = version or self.fingerprint(products)
+        self._prices = prices or self.parse_prices
+        self._ids = ids or self.parse_ids
+        self._price_indexes = {}
+        self._id_indexes = {}
+
+    def parse_prices(self, key):
+        prices = np.full(len(self.products[key]), np.nan)
+        for index, product in enumerate(self.products[key]):
+            try:
+                prices[index] = float(product['price'])
+            except (KeyError, TypeError, ValueError):
+                pass
+        return prices
+
+    def parse_ids(self, key):
+        return [str(product.get('id', '')) for product in self.products[key]]
+
+    def id_index(self, key):
+        """
+        Lists the product ids of a type and maps them back to product indexes, once per catalog load.
+
+        Returns:
+            tuple: The product ids in catalog order and a dictionary of product id to index.
+        """
+        index = self._id_indexes.get(key)
+
+        if index is None:
+            ids = list(self._ids(key))
+            index = self._id_indexes[key] = (ids, {product_id: position for position, product_id in enumerate(ids)})
+
+        return index
+
+    def price_index(self, key):
+        """
+        Sorts the products of a type by price, once per catalog load.
+
+        Products without a numeric price are left out.
+
+        Returns:
+            tuple: The product indexes in ascending price order and their prices.
+        """
+        index = self._price_indexes.get(key)
+
+        if index is None:
+            prices = self._prices(key)
+            priced = np.nonzero(~np.isnan(prices))[0]
+            order = priced[np.argsort(prices[priced], kind="stable")]
+            index = self._price_indexes[key] = (order, prices[order])
+
+        return index
+
+    @staticmethod
+    def fingerprint(products):
+        return hashlib.sha1(json.dumps(products, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(brand=snapshot.brand, products=snapshot.products, features=snapshot.features,
+                   version=snapshot.version, prices=snapshot.type_prices, ids=snapshot.type_ids)
+
+
+class CatalogCache:
+    """
+    A process-wide, thread-safe cache of converted brand catalogs.
+
+    Entries expire after ttl seconds and the least recently used brand is evicted
+    beyond max_size. With watch enabled, a snapshot listener is registered for every
+    loaded brand and drops its entry as soon as the products document changes.
+
+    With a SnapshotStore, loaded catalogs are written as memory-mapped snapshots shared
+    by every worker process, and a worker maps a current snapshot instead of fetching.
+    """
+
+    def __init__(self, backend, ttl=300.0, max_size=32, watch=False, snapshots=None):
+        self.backend = backend
+        self.watch = watch
+        self.snapshots = snapshots
+        self.entries = TTLCache(max_size=max_size, ttl=ttl)
+        self._watches = {}
+        self._lock = threading.Lock()
+
+    def get(self, brand):
+        entry = self.lookup(brand)
+        if entry is not None:
+            return entry
+
+        with stage("catalog_fetch"):
+            products = self.backend.fetch(brand)
+
+        return self.load(brand, products)
+
+    def lookup(self, brand):
+        """
+        Returns the cached entry of a brand, or maps its current snapshot.
+
+        Returns:
+            CatalogEntry: The entry, or None when the catalog must be fetched.
+        """
+        entry = self.entries.get(brand)
+        if entry is not None:
+            return entry
+
+        if self.watch:
+            self._watch(brand)
+
+        if self.snapshots is not None:
+            with stage("catalog_map"):
+                snapshot = self.snapshots.current(brand)
+            if snapshot is not None:
+                entry = CatalogEntry.from_snapshot(snapshot)
+                self.entries.set(brand, entry)
+                return entry
+
+        return None
+
+    def load(self, brand, products):
+        """
+        Converts a fetched product list into a cached entry, written as a snapshot when snapshots are on.
+
+        Returns:
+            CatalogEntry: The new entry.
+        """
+        with stage("catalog_convert"):
+            products = ProductListConverter(products=products).convert_to_dictionary()
+
+            entry = None
+
+            if self.snapshots is not None:
+                try:
+                    snapshot = self.snapshots.save(brand, version=CatalogEntry.fingerprint(products), products=products)
+                    entry = CatalogEntry.from_snapshot(snapshot)
+                except Exception as e:
+                    # The catalog is still served from this process when its snapshot cannot be written.
+                    logging.exception("Could not write the catalog snapshot of %s: %s", brand, str(e))
+
+            if entry is None:
+                entry = CatalogEntry(brand=brand, products=products)
+
+        self.entries.set(brand, entry)
+        return entry
+
+    def invalidate(self, brand):
+        self.entries.pop(brand)
+        if self.snapshots is not None:
+            self.snapshots.expire(brand)
+
+    def close(self):
+        with self._lock:
+            watches, self._watches = self._watches, {}
+
+        for watch in watches.values():
+            watch.unsubscribe()
+
+        self.entries.clear()
+
+    def _watch(self, brand):
+        with self._lock:
+            if brand not in self._watches:
+                self._watches[brand] = self.backend.watch(brand=brand, callback=self.invalidate)
+
+
+catalog_cache = CatalogCache(
+    backend=FirestoreCatalogBackend(),
+    ttl=float(os.environ.get("CATALOG_CACHE_TTL", 300)),
+    max_size=int(os.environ.get("CATALOG_CACHE_SIZE", 32)),
+    watch=os.environ.get("CATALOG_CACHE_WATCH", "false").lower() == "true",
+    # Set to a local directory to share memory-mapped catalog snapshots between worker processes.
+    snapshots=SnapshotStore(
+        directory=os.environ["CATALOG_SNAPSHOT_DIR"],
+        ttl=float(os.environ.get("CATALOG_CACHE_TTL", 300))
+    ) if os.environ.get("CATALOG_SNAPSHOT_DIR") else None
+)
+
+
+class AsyncFirestoreBackend:
+    """
+    Reads brand catalogs and validates API keys with the asyncio Firestore client.
+    """
+
+    async def fetch(self, brand):
+        snapshot = await async_firestore_client().collection("products").document(brand).get()
+        return snapshot.to_dict()['products']
+
+    async def validate_key(self, key):
+        results = await async_firestore_client().collection("users").where("key", "==", key).count().get()
+        return results[0][0].value > 0
+
+
+class AsyncInMemoryBackend:
+    """
+    An asyncio backend backed by dictionaries, for offline use, tests and load tests.
+
+    Every call waits latency seconds, standing in for a Firestore round trip.
+    """
+
+    def __init__(self, catalogs=None, keys=(), latency=0.0):
+        self.catalogs = dict(catalogs or {})
+        self.keys = set(keys)
+        self.latency = latency
+        self.fetch_count = 0
+
+    async def fetch(self, brand):
+        await asyncio.sleep(self.latency)
+        self.fetch_count += 1
+        return self.catalogs[brand]
+
+    async def validate_key(self, key):
+        await asyncio.sleep(self.latency)
+        return key in self.keys
+
+
+class AsyncCatalogCache:
+    """
+    Fetches catalogs through an asyncio backend into a CatalogCache.
+
+    Cached entries and snapshots are shared with the synchronous routes. Concurrent
+    misses of one brand share a single fetch and a single conversion, and the
+    conversion runs on a worker thread so it never blocks the event loop. Fetching and
+    loading are separate steps, so a fetch can start before the request is authorized
+    while only authorized requests convert and cache a catalog.
+    """
+
+    def __init__(self, cache, backend):
+        self.cache = cache
+        self.backend = backend
+        self.fetches = AsyncSingleFlight()
+        self.loads = AsyncSingleFlight()
+
+    def lookup(self, brand):
+        return self.cache.lookup(brand)
+
+    async def fetch(self, brand):
+        """
+        Fetches the product list of a brand without caching it.
+
+        The fetch is cancelled once every caller waiting for it was cancelled.
+
+        Returns:
+            list: The product list, as returned by the backend.
+        """
+        return await self.fetches.do(brand, lambda: self._fetch(brand))
+
+    async def get(self, brand, products=None):
+        """
+        Returns the cached entry of a brand, or fetches, converts and caches it.
+
+        Args:
+            brand (str): The brand.
+            products (asyncio.Future): A fetch() of the brand started earlier, or None.
+
+        Returns:
+            CatalogEntry: The entry of the brand.
+        """
+        entry = self.cache.lookup(brand)
+        if entry is not None:
+            if products is not None:
+                products.cancel()
+            return entry
+
+        products = await (products if products is not None else self.fetch(brand))
+        return await self.loads.do(brand, lambda: self._load(brand, products))
+
+    async def _fetch(self, brand):
+        with stage("catalog_fetch"):
+            return await self.backend.fetch(brand)
+
+    async def _load(self, brand, products):
+        return await asyncio.get_running_loop().run_in_executor(None, self.cache.load, brand, products)
+
+
+class AsyncKeyValidator:
+    """
+    Validates API keys through an asyncio backend, caching results in a CachedKeyValidator.
+    """
+
+    def __init__(self, validator, backend):
+        self.validator = validator
+        self.backend = backend
+        self.flight = AsyncSingleFlight()
+
+    async def validate_key(self, key):
+        is_valid = self.validator.keys.get(key)
+        if is_valid is not None:
+            return is_valid
+
+        return await self.flight.do(key, lambda: self._load(key))
+
+    async def _load(self, key):
+        return self.validator.remember(key, await self.backend.validate_key(key))
 
 
 class SimilarityChecker:
+    # Populations larger than this are deduplicated through the positional index.
+    INDEX_MIN_SIZE = 64
+
     def __init__(self, objects):
         self.objects = objects
 
@@ -80,7 +649,24 @@ class SimilarityChecker:
     def calculate_similarity(list1, list2):
         return sum(1 for x, y in zip(list1, list2) if x == y)
 
-    def remove_similar_lists(self, threshold):
+    def remove_similar_lists(self, threshold, indexed=None):
+        """
+        Keeps every list that has fewer than threshold equal positions with all lists kept before it.
+
+        Args:
+            threshold (int): The number of equal positions that makes two lists similar.
+            indexed (bool): Use the positional index, by default only for populations
+                larger than INDEX_MIN_SIZE. Both modes return the same lists.
+
+        Returns:
+            list: The kept lists, in their original order.
+        """
+        if indexed is None:
+            indexed = len(self.objects) > self.INDEX_MIN_SIZE
+
+        if indexed:
+            return self.remove_similar_lists_indexed(threshold)
+
         unique_population = [self.objects[0]]  # Initialize with the first list
 
         for new_list in self.objects[1:]:
@@ -95,6 +681,44 @@ class SimilarityChecker:
 
         return unique_population
 
+    def remove_similar_lists_indexed(self, threshold):
+        """
+        Same result as remove_similar_lists, using an index of (position, value) to kept lists.
+
+        Only kept lists sharing at least one position with a new list are visited, and the
+        postings count its equal positions exactly, instead of comparing it gene by gene
+        against every kept list.
+        """
+        unique_population = [self.objects[0]]
+
+        if threshold <= 0:
+            return unique_population
+
+        postings = {}
+        for position, value in enumerate(self.objects[0]):
+            postings.setdefault((position, value), []).append(0)
+
+        for new_list in self.objects[1:]:
+            matches = {}
+            is_similar = False
+
+            for position, value in enumerate(new_list):
+                for kept in postings.get((position, value), ()):
+                    matches[kept] = matches.get(kept, 0) + 1
+                    if matches[kept] >= threshold:
+                        is_similar = True
+                        break
+                if is_similar:
+                    break
+
+            if not is_similar:
+                kept = len(unique_population)
+                unique_population.append(new_list)
+                for position, value in enumerate(new_list):
+                    postings.setdefault((position, value), []).append(kept)
+
+        return unique_population
+
 
 class CombinationPriceCalculator:
     def __init__(self, products, requirements):
@@ -117,7 +741,8 @@ def require_key(view_func):
 
     Note:
         The `validate_key` method of the `KeyValidator` class is used to validate the API key.
-        It queries a Firebase database to check the token's validity. If valid, the view function
+        It queries a Firebase database to check the token's validity, and the result is cached
+        by `CachedKeyValidator` so repeat callers skip the query. If valid, the view function
         is executed; otherwise, it returns a JSON response with an "Invalid API key"
         error and a 401 status code (Unauthorized).
     """
@@ -125,7 +750,11 @@ def require_key(view_func):
     @wraps(view_func)
     def decorated_function(*args, **kwargs):
         secret_key = request.headers.get("secret-key")
-        if secret_key and key_validator.validate_key(secret_key):
+
+        with stage("validate_key"):
+            is_valid = bool(secret_key) and key_validator.validate_key(secret_key)
+
+        if is_valid:
             return view_func(*args, **kwargs)
         else:
             return json.dumps({"error": "Invalid API key"}), 401
@@ -0,0 +1,205 @@
+import logging
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import TTLCache
+
+
+class Saturated(Exception):
+    """
+    Raised when a JobExecutor has no free worker and its queue is full.
+
+    Attributes:
+        retry_after (int): Seconds after which a retry is likely to be admitted.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("Too many searches are running, retry in %d seconds." % retry_after)
+        self.retry_after = retry_after
+
+
+class JobExecutor:
+    """
+    Runs searches on a bounded pool of worker threads with admission control.
+
+    At most workers jobs run at once and at most max_queue more wait for a worker.
+    Submitting beyond that raises Saturated at once instead of queueing, so request
+    threads never pile up behind CPU-bound searches. The Retry-After estimate is the
+    time the queued jobs need to drain at the average job duration.
+
+    Attributes:
+        workers (int): The maximum number of jobs running at once.
+        max_queue (int): The maximum number of admitted jobs waiting for a worker.
+        running (int): The number of jobs running now.
+        queued (int): The number of admitted jobs waiting for a worker.
+        rejected (int): The number of jobs refused since start.
+    """
+
+    def __init__(self, workers=2, max_queue=16):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.running = 0
+        self.queued = 0
+        self.rejected = 0
+        self._duration = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+
+    def retry_after(self):
+        """
+        Estimates when a rejected job would be admitted.
+
+        Returns:
+            int: Whole seconds, at least 1.
+        """
+        duration = self._duration or 1.0
+        return max(1, math.ceil(duration * (self.queued + 1) / self.workers))
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Admits a job and schedules it on a worker.
+
+        Raises:
+            Saturated: When workers plus max_queue jobs are already admitted.
+
+        Returns:
+            concurrent.futures.Future: The future of the job result.
+        """
+        with self._lock:
+            if self.running + self.queued >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise Saturated(self.retry_after())
+            self.queued += 1
+
+        return self._executor.submit(self._run, function, args, kwargs)
+
+    def call(self, function, *args, **kwargs):
+        """
+        Runs a job on a worker and waits for its result.
+
+        A job that is already on a worker, such as a search started by a submitted
+        job, runs inline instead of waiting for a second worker.
+        """
+        if self.on_worker():
+            return function(*args, **kwargs)
+
+        return self.submit(function, *args, **kwargs).result()
+
+    def on_worker(self):
+        """
+        Returns whether the calling thread is running a job of this executor.
+        """
+        return getattr(self._local, "worker", False)
+
+    def _run(self, function, args, kwargs):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+
+        self._local.worker = True
+        started = time.perf_counter()
+
+        try:
+            return function(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - started
+            self._local.worker = False
+
+            with self._lock:
+                self.running -= 1
+                # An exponential moving average follows load changes within a few jobs.
+                self._duration = duration if self._duration is None else 0.8 * self._duration + 0.2 * duration
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class Job:
+    """
+    A search submitted through the jobs API.
+
+    Attributes:
+        id (str): The job id returned to the caller.
+        owner (str): A hash of the API key that submitted the job, only this key may read it.
+        status (str): "queued", "running", "done" or "failed".
+        result: The result of a done job.
+        error (str): The error message of a failed job.
+    """
+
+    def __init__(self, owner):
+        self.id = str(uuid.uuid4())
+        self.owner = owner
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+
+    def to_dict(self):
+        job = {"id": self.id, "status": self.status, "created": self.created}
+
+        if self.finished is not None:
+            job["finished"] = self.finished
+        if self.status == "done":
+            job["result"] = self.result
+        if self.status == "failed":
+            job["error"] = self.error
+
+        return job
+
+
+class JobStore:
+    """
+    The jobs of the jobs API, kept ttl seconds after they were submitted or finished.
+
+    At most max_size jobs are kept, the least recently read or updated is dropped first.
+    """
+
+    def __init__(self, max_size=1024, ttl=600.0):
+        self.jobs = TTLCache(max_size=max_size, ttl=ttl)
+
+    def submit(self, executor, owner, function, *args, **kwargs):
+        """
+        Admits a job on executor and tracks it.
+
+        Raises:
+            Saturated: When the executor refuses the job.
+
+        Returns:
+            Job: The queued job.
+        """
+        job = Job(owner=owner)
+        self.jobs.set(job.id, job)
+        try:
+            executor.submit(self._run, job, function, args, kwargs)
+        except Saturated:
+            self.jobs.pop(job.id)
+            raise
+
+        return job
+
+    def get(self, job_id, owner):
+        """
+        Returns a live job of owner, or None.
+        """
+        job = self.jobs.get(job_id)
+        return job if job is not None and job.owner == owner else None
+
+    def _run(self, job, function, args, kwargs):
+        job.status = "running"
+
+        try:
+            job.result = function(*args, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            logging.exception("Job %s failed: %s", job.id, str(e))
+            job.error = "An unexpected error occurred. Please try again later."
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            # Results are kept for ttl seconds after the job finished.
+            self.jobs.set(job.id, job)
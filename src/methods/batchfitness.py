@@ -0,0 +1,297 @@
+from itertools import combinations
+
+import numpy as np
+
+from methods.colorsimilarity import exceeds
+
+
+class BatchFitness:
+    """
+    A class for scoring a whole population of genomes with array operations.
+
+    The genome matrix (population x product types) indexes into per-type HSV and
+    gray flag arrays, and the pairwise hue and saturation scores of HueScore and
+    SaturationScore are accumulated pair by pair with array operations. Scores equal
+    the scalar fitness up to floating point rounding, and thresholds are compared with
+    exceeds() as in the scalar fitness, so rounding never flips a threshold.
+
+    Attributes:
+        products (dict): The filtered products, keyed by product type.
+        features (ProductFeatureIndex): The precomputed color features of the catalog, or
+            the SnapshotFeatureIndex of a memory-mapped catalog.
+    """
+
+    # The hue and saturation thresholds of the gray and colored groups, and the final score threshold.
+    GRAY_THRESHOLDS = (0.20, 0.60)
+    COLORED_THRESHOLDS = (0.95, 0.40)
+    SCORE_THRESHOLD = 0.45
+
+    def __init__(self, products, features):
+        """
+        Initializes a BatchFitness object and builds the per-type feature arrays.
+
+        Args:
+            products (dict): The filtered products, keyed by product type.
+            features (ProductFeatureIndex): The precomputed color features of the catalog, or
+            the SnapshotFeatureIndex of a memory-mapped catalog.
+        """
+        self.products = products
+        self.features = features
+        self.hsv = []
+        self.gray = []
+        self.known = []
+
+        for key in products:
+            hsv, gray, known = features.columns(key)
+
+            # A type without products keeps one unknown row, so its genes can still be looked up.
+            if not len(known):
+                hsv, gray, known = np.zeros((1, 3)), np.zeros(1, dtype=bool), np.zeros(1, dtype=bool)
+
+            self.hsv.append(hsv)
+            self.gray.append(gray)
+            self.known.append(known)
+
+    def __getstate__(self):
+        # Island workers only score genomes, so a pickled engine keeps its feature arrays, not the catalog.
+        return {
+            "products": None,
+            "features": None,
+            "hsv": [np.asarray(hsv) for hsv in self.hsv],
+            "gray": [np.asarray(gray) for gray in self.gray],
+            "known": [np.asarray(known) for known in self.known],
+        }
+
+    def _gather(self, genomes):
+        """
+        Looks up the hue, gray flag and presence of every gene.
+
+        Args:
+            genomes (numpy.ndarray): The genome matrix (population x product types).
+
+        Returns:
+            tuple: Hue, gray and known matrices shaped like the genome matrix.
+        """
+        hues = np.zeros(genomes.shape)
+        gray = np.zeros(genomes.shape, dtype=bool)
+        known = np.zeros(genomes.shape, dtype=bool)
+
+        for column in range(genomes.shape[1]):
+            genes = genomes[:, column]
+            in_range = (genes >= 0) & (genes < len(self.known[column]))
+            safe_genes = np.where(in_range, genes, 0)
+            hues[:, column] = self.hsv[column][safe_genes, 0]
+            gray[:, column] = self.gray[column][safe_genes]
+            known[:, column] = self.known[column][safe_genes] & in_range
+
+        return hues, gray, known
+
+    @staticmethod
+    def _group_totals(hues, members):
+        """
+        Sums the pairwise hue and saturation scores of one color group (gray or colored).
+
+        Args:
+            hues (numpy.ndarray): The hue matrix of the population.
+            members (numpy.ndarray): Which genes belong to the group.
+
+        Returns:
+            tuple: The hue total, saturation total and member count of every genome.
+        """
+        hue_total = np.zeros(hues.shape[0])
+        saturation_total = np.zeros(hues.shape[0])
+
+        for index_a, index_b in combinations(range(hues.shape[1]), 2):
+            pair = members[:, index_a] & members[:, index_b]
+            difference = np.abs(hues[:, index_a] - hues[:, index_b])
+            hue_total += np.where(pair, 1 - np.minimum(difference, 1 - difference), 0.0)
+            saturation_total += np.where(pair, 1 - difference, 0.0)
+
+        return hue_total, saturation_total, members.sum(axis=1)
+
+    @staticmethod
+    def _group_score(hue_total, saturation_total, count, hue_threshold, saturation_threshold):
+        """
+        Scores one color group (gray or colored) of every genome from its totals.
+
+        Args:
+            hue_total (numpy.ndarray): The summed pairwise hue scores of the group.
+            saturation_total (numpy.ndarray): The summed pairwise saturation scores of the group.
+            count (numpy.ndarray): The number of genes in the group.
+            hue_threshold (float): The hue score a group must exceed to keep its full score.
+            saturation_threshold (float): The saturation score a group must exceed as well.
+
+        Returns:
+            numpy.ndarray: The group score of every genome.
+        """
+        pairs = np.maximum(count * (count - 1) // 2, 1)
+        hue_score = hue_total / pairs
+        saturation_score = saturation_total / pairs
+
+        matched = exceeds(hue_score, hue_threshold) & exceeds(saturation_score, saturation_threshold)
+        return np.where(count > 1, np.where(matched, hue_score, hue_score / 2), 0.99)
+
+    def totals(self, population):
+        """
+        Sums the pairwise scores of the gray and colored groups of every genome.
+
+        Args:
+            population (list): A list of genomes.
+
+        Returns:
+            numpy.ndarray: Shaped (population, 2, 3): per group (gray, colored) the hue
+            total, saturation total and member count.
+        """
+        genomes = np.asarray(population, dtype=np.int64).reshape(len(population), -1)[:, :len(self.hsv)]
+        hues, gray, known = self._gather(genomes)
+
+        return np.stack([
+            np.stack(self._group_totals(hues, known & gray), axis=1),
+            np.stack(self._group_totals(hues, known & ~gray), axis=1)
+        ], axis=1)
+
+    def score_totals(self, totals):
+        """
+        Scores genomes from their group totals.
+
+        Args:
+            totals (numpy.ndarray): Group totals as returned by totals().
+
+        Returns:
+            numpy.ndarray: The fitness score of every genome.
+        """
+        g_score = self._group_score(*totals[:, 0].T, *self.GRAY_THRESHOLDS)
+        c_score = self._group_score(*totals[:, 1].T, *self.COLORED_THRESHOLDS)
+
+        middle = (g_score + c_score) / 2
+        return np.where(exceeds(middle, self.SCORE_THRESHOLD), middle, 0.0)
+
+    def borderline(self, totals, margin):
+        """
+        Finds genomes whose group averages or score lie within margin of a threshold.
+
+        Args:
+            totals (numpy.ndarray): Group totals as returned by totals().
+            margin (float): The distance to a threshold that counts as borderline.
+
+        Returns:
+            numpy.ndarray: Whether each genome is borderline.
+        """
+        near = np.zeros(len(totals), dtype=bool)
+        pairs = np.maximum(totals[:, :, 2] * (totals[:, :, 2] - 1) // 2, 1)
+
+        for group, thresholds in enumerate((self.GRAY_THRESHOLDS, self.COLORED_THRESHOLDS)):
+            for column, threshold in enumerate(thresholds):
+                near |= np.abs(totals[:, group, column] / pairs[:, group] - threshold) < margin
+
+        g_score = self._group_score(*totals[:, 0].T, *self.GRAY_THRESHOLDS)
+        c_score = self._group_score(*totals[:, 1].T, *self.COLORED_THRESHOLDS)
+        return near | (np.abs((g_score + c_score) / 2 - self.SCORE_THRESHOLD) < margin)
+
+    def evaluate(self, population):
+        """
+        Scores every genome of a population.
+
+        Args:
+            population (list): A list of genomes.
+
+        Returns:
+            numpy.ndarray: The fitness score of every genome, in population order.
+        """
+        return self.score_totals(self.totals(population))
+
+    def __call__(self, population):
+        return [float(score) for score in self.evaluate(population)]
+
+
+class IncrementalFitness:
+    """
+    A class for scoring offspring from the group totals of their parents.
+
+    An offspring differs from one of its parents in a few genes only. Starting from the
+    totals of the closer parent, every changed gene has its pairs with the other genes
+    removed, then added back with its new product, so scoring costs O(n) per changed gene
+    instead of the O(n^2) pairs of a full evaluation. The pair scores are computed from
+    the per-type HSV arrays of BatchFitness. Scores equal BatchFitness.evaluate up to
+    floating point rounding. Updated totals drift from a full evaluation over generations,
+    so offspring within MARGIN of a threshold are evaluated in full, and drift never
+    flips a threshold.
+
+    Attributes:
+        batch_fitness (BatchFitness): The full evaluation of the catalog.
+    """
+
+    # Far above the drift of updated totals, which stays around 1e-13 after hundreds of generations.
+    MARGIN = 1e-6
+
+    def __init__(self, batch_fitness):
+        """
+        Initializes an IncrementalFitness object.
+
+        Args:
+            batch_fitness (BatchFitness): The full evaluation of the catalog.
+        """
+        self.batch_fitness = batch_fitness
+
+    def evaluate(self, genomes):
+        """
+        Fully scores a genome matrix.
+
+        Args:
+            genomes (numpy.ndarray): The genome matrix (population x product types).
+
+        Returns:
+            tuple: The scores and the group totals of every genome.
+        """
+        totals = self.batch_fitness.totals(genomes)
+        return self.batch_fitness.score_totals(totals), totals
+
+    def update(self, parents, parent_totals, candidates, children):
+        """
+        Scores offspring from the totals of their parents.
+
+        Args:
+            parents (numpy.ndarray): The genome matrix of the previous generation.
+            parent_totals (numpy.ndarray): The group totals of the previous generation.
+            candidates (numpy.ndarray): Two parent rows per offspring. The offspring is
+                updated from the one it shares more genes with.
+            children (numpy.ndarray): The genome matrix of the offspring.
+
+        Returns:
+            tuple: The scores and the group totals of every offspring.
+        """
+        first, second = candidates[:, 0], candidates[:, 1]
+        closer = (children != parents[second]).sum(axis=1) < (children != parents[first]).sum(axis=1)
+        rows = np.where(closer, second, first)
+
+        parent = parents[rows]
+        totals = parent_totals[rows].copy()
+        changed = children != parent
+        entries, columns = np.nonzero(changed)
+
+        if len(entries):
+            # A pair of two changed genes is seen from both genes, so each side counts half.
+            weights = np.where(changed[entries], 0.5, 1.0)
+            weights[np.arange(len(entries)), columns] = 0.0
+
+            # Remove the pairs of every changed gene as in the parent, then add them as in the offspring.
+            for genomes, sign in ((parent, -1.0), (children, 1.0)):
+                hues, gray, known = self.batch_fitness._gather(genomes)
+                groups = np.where(known, np.where(gray, 0, 1), -1)
+                group = groups[entries, columns]
+                difference = np.abs(hues[entries] - hues[entries, columns][:, None])
+                pair = np.where(groups[entries] == group[:, None], weights, 0.0)
+
+                change = np.stack([
+                    (pair * (1 - np.minimum(difference, 1 - difference))).sum(axis=1),
+                    (pair * (1 - difference)).sum(axis=1),
+                    np.ones(len(entries))
+                ], axis=1)
+                grouped = group >= 0
+                np.add.at(totals, (entries[grouped], group[grouped]), sign * change[grouped])
+
+        borderline = self.batch_fitness.borderline(totals, self.MARGIN)
+        if borderline.any():
+            totals[borderline] = self.batch_fitness.totals(children[borderline])
+
+        return self.batch_fitness.score_totals(totals), totals
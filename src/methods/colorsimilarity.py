@@ -1,7 +1,12 @@
 from colorsys import rgb_to_hsv
 
 from colorsys import rgb_to_hsv
-from itertools import combinations
+
+import numpy as np
+
+# Averages are rounded to this many decimals before they are compared with a fitness threshold,
+# so the same average summed in another order always falls on the same side of the threshold.
+SCORE_DECIMALS = 9
 
 
 class Color:
@@ -123,6 +128,61 @@ class ColorFeatureExtractor:
         return hsv_color[2]
 
 
+class ColorProfile:
+    """
+    Holds the precomputed features of a color so they are parsed only once.
+    """
+
+    def __init__(self, color, threshold=12):
+        """
+        Initialize the ColorProfile object and extract every feature of the color.
+
+        :param color: The color value, with or without a leading "#".
+        :param threshold: The threshold for identifying grayscale.
+        """
+        self.hex = Color(color).hex()
+        self.rgb = int(self.hex[0:2], 16), int(self.hex[2:4], 16), int(self.hex[4:6], 16)
+        self.hsv = ColorFeatureExtractor(self.hex).rgb_to_hsv()
+        self.is_gray = ColorGrayScaleIdentifier(self.hex).is_gray(threshold=threshold)
+
+    @classmethod
+    def parse(cls, color, threshold=12):
+        """
+        Build the profile of a color value, skipping values that are not hex colors.
+
+        :param color: The color value, possibly missing or not a string.
+        :param threshold: The threshold for identifying grayscale.
+        :return: A ColorProfile, or None when the value is not a valid hex color.
+        """
+        if isinstance(color, str) and HexValidator(Color(color).hex()).is_valid():
+            return cls(color, threshold=threshold)
+        return None
+
+    def hue(self):
+        """
+        Get the hue value of the color.
+
+        :return: Hue value.
+        """
+        return self.hsv[0]
+
+    def saturation(self):
+        """
+        Get the saturation value of the color.
+
+        :return: Saturation value.
+        """
+        return self.hsv[1]
+
+    def value(self):
+        """
+        Get the value (brightness) of the color.
+
+        :return: Value (brightness) of the color.
+        """
+        return self.hsv[2]
+
+
 class Similarity:
     """
     Represents similarity between two values.
@@ -192,18 +252,72 @@ class ValueSimilarity(Similarity):
         return float(1 - value_difference)
 
 
+def exceeds(score, threshold):
+    """
+    Check if a score is above a threshold once rounded to SCORE_DECIMALS.
+
+    Pairwise loops, prefix sums and batch or incremental totals add the same terms in
+    different orders, so an average equal to a threshold can land just above it.
+
+    :param score: A score, or a numpy array of scores.
+    :param threshold: The threshold the score must exceed.
+    :return: True if the score is above the threshold, or a boolean array.
+    """
+    return np.round(score, SCORE_DECIMALS) > threshold
+
+
+def mean_circular_distance(values):
+    """
+    Calculate the mean circular distance over all pairs of values on a unit circle.
+
+    The values are sorted once and every pair is split, with prefix sums, into pairs
+    closer going forward and pairs closer going around, so the cost is O(n log n)
+    instead of O(n^2). It equals the pairwise mean up to floating point rounding.
+
+    :param values: Values in [0, 1), at least two.
+    :return: The mean of min(|a - b|, 1 - |a - b|) over all pairs.
+    """
+    values = sorted(values)
+    prefix = [0.0]
+    for value in values:
+        prefix.append(prefix[-1] + value)
+
+    total = 0.0
+    wrapped = 0
+    for index, value in enumerate(values):
+        # Values before `wrapped` are more than half a turn behind, so they are closer going around.
+        while value - values[wrapped] > 0.5:
+            wrapped += 1
+
+        total += wrapped * (1 - value) + prefix[wrapped]
+        total += (index - wrapped) * value - (prefix[index] - prefix[wrapped])
+
+    return total / (len(values) * (len(values) - 1) // 2)
+
+
+def mean_absolute_difference(values):
+    """
+    Calculate the mean absolute difference over all pairs of values in O(n log n).
+
+    :param values: At least two values.
+    :return: The mean of |a - b| over all pairs.
+    """
+    total = 0.0
+    running_sum = 0.0
+    for index, value in enumerate(sorted(values)):
+        total += index * value - running_sum
+        running_sum += value
+
+    return total / (len(values) * (len(values) - 1) // 2)
+
+
 class HueScore:
     def __init__(self, hue_features):
         self.hue_features = hue_features
 
     def calculate(self):
-        hue_scores = [
-            1 - (min(abs(value_1 - value_2), 1 - abs(value_1 - value_2)))
-            for (index_a, value_1), (index_b, value_2)
-            in combinations(enumerate(self.hue_features), 2)
-        ]
-
-        avg_hue_score = sum(hue_scores) / len(hue_scores)
+        # Average of 1 - circular distance over every pair of hues.
+        avg_hue_score = 1 - mean_circular_distance(self.hue_features)
 
         return avg_hue_score
 
@@ -213,13 +327,8 @@ class SaturationScore:
         self.saturation_features = saturation_features
 
     def calculate(self):
-        saturation_scores = [
-            (1 - abs(value_1 - value_2))
-            for (index_a, value_1), (index_b, value_2) in
-            combinations(enumerate(self.saturation_features), 2)
-        ]
-
-        avg_saturation_score = sum(saturation_scores) / len(saturation_scores)
+        # Average of 1 - absolute difference over every pair of saturations.
+        avg_saturation_score = 1 - mean_absolute_difference(self.saturation_features)
 
         return avg_saturation_score
 
@@ -229,13 +338,8 @@ class ValueScore:
         self.value_features = value_features
 
     def calculate(self):
-        value_scores = [
-            (1 - abs(value_1 - value_2))
-            for (index_a, value_1), (index_b, value_2) in
-            combinations(enumerate(self.value_features), 2)
-        ]
-
-        avg_value_score = sum(value_scores) / len(value_scores)
+        # Average of 1 - absolute difference over every pair of values.
+        avg_value_score = 1 - mean_absolute_difference(self.value_features)
 
         return avg_value_score
 
@@ -243,7 +347,6 @@ class ValueScore:
 
 
 
-
 if __name__ == "__main__":
     colors = ["#D9D9D9", "AAAAAA", "#7E7E7E", "86A5B9", "#8DB8D4"]
     standard_colors = [Color(color).hex() for color in colors]
@@ -0,0 +1,227 @@
+import numpy as np
+
+
+class CompactPopulation:
+    """
+    A population stored as one integer matrix (genomes x product types).
+
+    Two matrices are allocated once and swapped every generation, and selection,
+    crossover and mutation run as batch operations over the whole next generation,
+    so breeding allocates no per-genome lists or operator objects. The breeding rules
+    are those of Population.next_generation, Crossover.single_point_crossover and
+    Mutation.make_linear_mutation.
+
+    Attributes:
+        limits (numpy.ndarray): The highest value of every gene.
+        genomes (numpy.ndarray): The current genomes, one per row.
+        rng (numpy.random.Generator): The random generator of the request.
+    """
+
+    __slots__ = ("limits", "genomes", "rng", "_spare", "_size")
+
+    def __init__(self, limits, size, rng, seeds=None):
+        """
+        Initializes a CompactPopulation object with random genomes.
+
+        Args:
+            limits (list): A list of integer limits for genome generation.
+            size (int): The size of the population.
+            rng (numpy.random.Generator): The random generator of the request.
+            seeds (list): Genomes placed in the first rows instead of random ones.
+        """
+        self.limits = np.asarray(limits, dtype=np.int64)
+        self.rng = rng
+        self.genomes = rng.integers(0, self.limits + 1, size=(size, len(self.limits)), dtype=np.int64)
+        if seeds:
+            seeds = seeds[:size]
+            self.genomes[:len(seeds)] = np.asarray(seeds, dtype=np.int64).reshape(len(seeds), len(self.limits))
+        self._spare = np.empty_like(self.genomes)
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def previous(self):
+        """
+        The ranked generation the current one was bred from, until the next rank().
+        """
+        return self._spare
+
+    def rank(self, scores):
+        """
+        Sorts the genomes by fitness in place, best first. Equal scores keep their order.
+
+        Args:
+            scores (numpy.ndarray): The fitness score of every genome, in population order.
+
+        Returns:
+            numpy.ndarray: The sorting order, to sort the scores and any per-genome data alike.
+        """
+        order = np.argsort(-np.asarray(scores, dtype=float), kind="stable")
+        np.take(self.genomes[:self._size], order, axis=0, out=self._spare[:self._size])
+        self._swap()
+        return order
+
+    def next_generation(self, weights):
+        """
+        Breeds the next generation of a population sorted best first, in place.
+
+        The two best genomes are kept. Every pair of parents is selected by fitness and
+        crossed over at one point, and both children are mutations of the second
+        offspring, as in Population.next_generation.
+
+        Args:
+            weights (numpy.ndarray): The fitness score of every genome, in population order.
+
+        Returns:
+            numpy.ndarray: The two parent rows in previous of every new genome. Kept
+            genomes list their own row twice.
+        """
+        size = self._size
+        pairs = max(size // 2 - 1, 0)
+        elites = min(size, 2)
+        current, spare = self.genomes, self._spare
+        spare[:elites] = current[:elites]
+        candidates = np.repeat(np.arange(elites), 2).reshape(elites, 2)
+
+        if pairs:
+            weights = np.asarray(weights, dtype=float)
+            parents = self.rng.choice(size, size=(pairs, 2), p=weights / weights.sum())
+            # Genomes shorter than two genes are not crossed over, so offspring_b is genome_b.
+            if current.shape[1] < 2:
+                points = np.full(pairs, current.shape[1])
+            else:
+                points = self.rng.integers(0, current.shape[1], size=pairs)
+            columns = np.arange(current.shape[1])
+
+            # offspring_b = genome_b[:point] + genome_a[point:], written to both child rows.
+            children = spare[elites:elites + 2 * pairs].reshape(pairs, 2, -1)
+            children[:] = np.where(
+                columns < points[:, None],
+                current[parents[:, 1]],
+                current[parents[:, 0]]
+            )[:, None, :]
+
+            self._mutate(spare[elites:elites + 2 * pairs])
+            self._mutate(spare[elites:elites + 2 * pairs])
+            candidates = np.concatenate([candidates, np.repeat(parents, 2, axis=0)])
+
+        self._size = elites + 2 * pairs
+        self._swap()
+        return candidates
+
+    def _mutate(self, genomes):
+        """
+        Moves one random gene of every genome one step up or down, within its limits.
+        """
+        rows = np.arange(len(genomes))
+        positions = self.rng.integers(0, genomes.shape[1], size=len(genomes))
+        steps = np.where(self.rng.random(len(genomes)) < 0.5, 1, -1)
+        genomes[rows, positions] = np.clip(genomes[rows, positions] + steps, 0, self.limits[positions])
+
+    def _swap(self):
+        self.genomes, self._spare = self._spare, self.genomes
+
+    def tolist(self):
+        return self.genomes[:self._size].tolist()
+
+
+class CompactEvolution:
+    """
+    The genetic algorithm of Evolution on a CompactPopulation.
+
+    With an incremental scorer, offspring are scored from the group totals of their
+    parents instead of from scratch, and population_fitness is not used.
+
+    With a constraint such as PriceBounds, every new genome is repaired into the
+    constraint, and genomes still outside it score 0 without being evaluated.
+
+    Attributes:
+        limits (list): A list of integer limits for genome generation.
+        population_fitness (callable): Scores a genome matrix, e.g. BatchFitness.evaluate.
+        incremental (IncrementalFitness): Scores offspring from their parents, or None.
+        constraint (PriceBounds): Limits the genomes explored, or None.
+        rng (numpy.random.Generator): The random generator of the request.
+        population (CompactPopulation): The current population.
+        generations_run (int): The number of generations scored so far.
+    """
+
+    __slots__ = ("limits", "population_fitness", "incremental", "constraint", "rng", "population", "generations_run")
+
+    def __init__(self, limits, population_fitness, rng, incremental=None, constraint=None):
+        """
+        Initializes a CompactEvolution object.
+
+        Args:
+            limits (list): A list of integer limits for genome generation.
+            population_fitness (callable): Scores a genome matrix and returns one score per row.
+            rng (numpy.random.Generator): The random generator of the request.
+            incremental (IncrementalFitness): Scores offspring from their parents, or None.
+            constraint (PriceBounds): Limits the genomes explored, or None.
+        """
+        self.limits = limits
+        self.population_fitness = population_fitness
+        self.incremental = incremental
+        self.constraint = constraint
+        self.rng = rng
+        self.population = None
+        self.generations_run = 0
+
+    def generations(self, size, generation, seeds=None):
+        """
+        Evolves a random population, yielding every generation ranked best first.
+
+        Evolution stops early when the best genome of a generation scores 0. The yielded
+        matrix is reused by the next generation, so copy rows that must be kept.
+
+        Args:
+            size (int): The size of the initial population.
+            generation (int): The number of generations to run.
+            seeds (list): Genomes that replace part of the random initial population.
+
+        Yields:
+            tuple: The ranked genome matrix and its scores.
+        """
+        self.population = CompactPopulation(limits=self.limits, size=size, rng=self.rng, seeds=seeds)
+        self.repair()
+        candidates = totals = None
+
+        for i in range(generation):
+            genomes = self.population.genomes[:len(self.population)]
+            feasible = None
+
+            if self.constraint is not None:
+                feasible = self.constraint.feasible(genomes)
+
+            if self.incremental is None:
+                scores = np.zeros(len(genomes))
+                if feasible is None:
+                    scores[:] = self.population_fitness(genomes)
+                elif feasible.any():
+                    scores[feasible] = self.population_fitness(genomes[feasible])
+            elif totals is None:
+                scores, totals = self.incremental.evaluate(genomes)
+            else:
+                scores, totals = self.incremental.update(self.population.previous, totals, candidates, genomes)
+
+            if feasible is not None and self.incremental is not None:
+                scores[~feasible] = 0.0
+
+            order = self.population.rank(scores)
+            scores = scores[order]
+            if totals is not None:
+                totals = totals[order]
+            self.generations_run += 1
+
+            yield self.population.genomes[:len(self.population)], scores
+
+            if scores[0] == 0:
+                return
+
+            candidates = self.population.next_generation(weights=scores)
+            self.repair()
+
+    def repair(self):
+        if self.constraint is not None:
+            self.constraint.repair(self.population.genomes[:len(self.population)], self.rng)
@@ -1,3 +1,4 @@
+import heapq
 import random
 
 
@@ -31,17 +32,19 @@ class Genome:
         """
         return [random.randint(0, gen) for gen in self.limits]
 
-    def make_population(self, size):
+    def make_population(self, size, seeds=None):
         """
         Generates a population of genomes with the given size.
 
         Args:
             size (int): The size of the population to generate.
+            seeds (list): Genomes placed first in the population, the rest being random.
 
         Returns:
             list: A list of lists representing the generated population.
         """
-        return [self.make_genome() for _ in range(size)]
+        population = [list(genome) for genome in (seeds or [])[:size]]
+        return population + [self.make_genome() for _ in range(size - len(population))]
 
 
 class Mutation:
@@ -149,22 +152,229 @@ class Population:
     def get_first_two_items(self):
         return self.population[0:2]
 
-    def select(self, fitness_function):
+    def select(self, fitness_function=None, weights=None):
         """
         Selects two genomes from the population based on a fitness function.
 
         Args:
             fitness_function (callable): The fitness function used for selection.
+            weights (list): Precomputed fitness scores of the population, used instead
+                of calling the fitness function when given.
 
         Returns:
             tuple: Two selected genomes.
         """
+        if weights is None:
+            weights = [fitness_function(genome=genome) for genome in self.population]
+
         return random.choices(
             population=self.population,
-            weights=[fitness_function(genome=genome) for genome in self.population],
+            weights=weights,
             k=2
         )
 
+    def rank(self, scores):
+        """
+        Sorts the population by fitness, best first. Equal scores keep their order.
+
+        Args:
+            scores (list): The fitness score of every genome, in population order.
+
+        Returns:
+            tuple: The sorted population and the sorted scores.
+        """
+        ranked = sorted(
+            zip(self.population, scores),
+            key=lambda item: item[1],
+            reverse=True
+        )
+        return [genome for genome, score in ranked], [score for genome, score in ranked]
+
+    def next_generation(self, weights, limits):
+        """
+        Breeds the next generation of a population sorted best first.
+
+        The two best genomes are kept and the rest is filled with mutated offspring
+        of parents selected by fitness.
+
+        Args:
+            weights (list): The fitness score of every genome, in population order.
+            limits (list): A list of integer limits for mutation.
+
+        Returns:
+            list: The next generation.
+        """
+        next_generation = self.population[0:2]
+
+        for spring in range(int(len(self.population) / 2) - 1):
+            parents = self.select(weights=weights)
+            offspring_a, offspring_b = Crossover(parents[0], parents[1]).single_point_crossover()
+            offspring_a = Mutation(genome=offspring_b, limits=limits).make_linear_mutation()
+            offspring_b = Mutation(genome=offspring_b, limits=limits).make_linear_mutation()
+
+            next_generation += [offspring_a, offspring_b]
+
+        return next_generation
+
+
+class Evolution:
+    """
+    A class for running the genetic algorithm one generation at a time.
+
+    Attributes:
+        limits (list): A list of integer limits for genome generation.
+        population_fitness (callable): Scores a list of genomes.
+        population (list): The current population. After the last generation it holds the
+            bred, not yet scored offspring, or the ranked population when evolution stopped early.
+        generations_run (int): The number of generations scored so far.
+    """
+
+    def __init__(self, limits, population_fitness):
+        """
+        Initializes an Evolution object.
+
+        Args:
+            limits (list): A list of integer limits for genome generation.
+            population_fitness (callable): Scores a list of genomes and returns one score per genome.
+        """
+        self.limits = limits
+        self.population_fitness = population_fitness
+        self.population = []
+        self.generations_run = 0
+
+    def generations(self, size, generation, population=None):
+        """
+        Evolves a population, yielding every generation ranked best first.
+
+        Evolution stops early when the best genome of a generation scores 0.
+
+        Args:
+            size (int): The size of a random initial population.
+            generation (int): The number of generations to run.
+            population (list): An initial population used instead of a random one.
+
+        Yields:
+            tuple: The ranked population and its scores.
+        """
+        self.population = population if population is not None else Genome(self.limits).make_population(size)
+
+        for i in range(generation):
+            # Score the generation once; sorting and every selection below reuse it.
+            scores = self.population_fitness(self.population)
+            self.population, scores = Population(population=self.population).rank(scores)
+            self.generations_run += 1
+
+            yield self.population, scores
+
+            if scores[0] == 0:
+                return
+
+            self.population = Population(population=self.population).next_generation(
+                weights=scores,
+                limits=self.limits
+            )
+
+
+class HallOfFame:
+    """
+    The best distinct genomes seen across generations, kept in a bounded min-heap.
+
+    Genomes are deduplicated by their genes, only genomes scoring above the threshold
+    are admitted, and a full hall only replaces its worst genome with a better one.
+    The data of a genome, such as its products and price, is computed once by the
+    materialize function when the genome is admitted.
+
+    Attributes:
+        capacity (int): The maximum number of genomes kept.
+        threshold (float): The score a genome must exceed to be admitted.
+        materialize (callable): Computes the data kept with a genome, or None.
+        admitted (int): The number of genomes admitted so far, including replaced ones.
+    """
+
+    def __init__(self, capacity, threshold=0.93, materialize=None):
+        """
+        Initializes an empty HallOfFame object.
+
+        Args:
+            capacity (int): The maximum number of genomes kept.
+            threshold (float): The score a genome must exceed to be admitted.
+            materialize (callable): Computes the data kept with a genome, or None.
+        """
+        self.capacity = capacity
+        self.threshold = threshold
+        self.materialize = materialize
+        self.admitted = 0
+        # (score, -admission number, genes, data): the worst and, among equals, newest genome on top.
+        self._heap = []
+        self._keys = set()
+
+    def _worst(self):
+        return self._heap[0][0] if len(self._heap) >= self.capacity else self.threshold
+
+    def add(self, genome, score):
+        """
+        Admits a genome if it scores above the threshold, is new and beats the worst one of a full hall.
+
+        Args:
+            genome (list): The genome.
+            score (float): Its fitness score.
+
+        Returns:
+            bool: Whether the genome was admitted.
+        """
+        score = float(score)
+        key = tuple(int(gene) for gene in genome)
+
+        if score <= self._worst() or key in self._keys:
+            return False
+
+        self.admitted += 1
+        data = self.materialize(list(key)) if self.materialize is not None else None
+        entry = (score, -self.admitted, key, data)
+
+        if len(self._heap) >= self.capacity:
+            self._keys.discard(heapq.heapreplace(self._heap, entry)[2])
+        else:
+            heapq.heappush(self._heap, entry)
+
+        self._keys.add(key)
+        return True
+
+    def offer(self, population, scores):
+        """
+        Offers a ranked generation, stopping at the first genome that cannot be admitted on score.
+
+        Args:
+            population (list): The genomes, best first.
+            scores (list): Their scores.
+
+        Returns:
+            int: The number of genomes admitted.
+        """
+        admitted = 0
+
+        for genome, score in zip(population, scores):
+            if score <= self._worst():
+                break
+            admitted += self.add(genome, score)
+
+        return admitted
+
+    def best(self):
+        """
+        Returns the kept genomes, best first. Equal scores keep their admission order.
+
+        Returns:
+            list: (genome, score, data) tuples.
+        """
+        return [(list(key), score, data) for score, order, key, data in sorted(self._heap, reverse=True)]
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, genome):
+        return tuple(int(gene) for gene in genome) in self._keys
+
 
 if __name__ == "__main__":
     print("Methods")
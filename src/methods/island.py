@@ -0,0 +1,293 @@
+import atexit
+import hashlib
+import multiprocessing
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from methods.genetic import Evolution, Genome, HallOfFame, Population
+
+# The fitness engines a worker process has loaded, by catalog key, so a catalog is read once per worker.
+_worker_state = OrderedDict()
+# The fitness engines written for the workers, by catalog key, as [path, runs using it]. A file no
+# run uses is kept for later runs of its key, the least recently used deleted beyond MAX_PUBLISHED.
+_published = OrderedDict()
+MAX_PUBLISHED = 32
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+_directory = None
+
+
+def _worker_fitness(key, path):
+    """
+    Returns the fitness engine of a catalog key, loading it from path the first time a worker sees the key.
+    """
+    population_fitness = _worker_state.get(key)
+
+    if population_fitness is None:
+        with open(path, "rb") as source:
+            population_fitness = pickle.load(source)
+        _worker_state[key] = population_fitness
+        while len(_worker_state) > MAX_PUBLISHED:
+            _worker_state.popitem(last=False)
+
+    return population_fitness
+
+
+def evolve_island(key, path, limits, population, size, generations, seed, hall_of_fame=None):
+    """
+    Evolves one island for a number of generations inside a worker process.
+
+    Args:
+        key (str): The catalog key of the fitness engine.
+        path (str): The file the fitness engine was published to.
+        limits (list): A list of integer limits for genome generation.
+        population (list): The island population, completed with random genomes up to size.
+        size (int): The population size.
+        generations (int): The number of generations to run.
+        seed (int): The random seed of this run, since workers are reused across runs.
+        hall_of_fame (HallOfFame): An empty hall offered every ranked generation, or None.
+
+    Returns:
+        tuple: The final population sorted best first, its scores, the number of generations
+        run and the (genome, score) pairs kept by hall_of_fame.
+    """
+    random.seed(seed)
+    population_fitness = _worker_fitness(key, path)
+    evolution = Evolution(limits=limits, population_fitness=population_fitness)
+    population = Genome(limits).make_population(size, seeds=population)
+
+    for ranked, scores in evolution.generations(size=size, generation=generations, population=population):
+        if hall_of_fame is not None:
+            hall_of_fame.offer(ranked, scores)
+
+    population, scores = Population(population=evolution.population).rank(population_fitness(evolution.population))
+    if hall_of_fame is not None:
+        hall_of_fame.offer(population, scores)
+
+    elites = [] if hall_of_fame is None else [(genome, score) for genome, score, data in hall_of_fame.best()]
+    return population, scores, evolution.generations_run, elites
+
+
+def process_pool(workers):
+    """
+    Returns the process pool shared by every island run of this process, started on first use.
+
+    Workers are started by a fork server, or spawned where there is none, since forking a
+    process with running threads can copy locks held by other threads into the child.
+
+    Args:
+        workers (int): The number of worker processes the pool needs at least.
+
+    Returns:
+        ProcessPoolExecutor: The shared pool.
+    """
+    global _pool, _pool_workers
+
+    with _pool_lock:
+        if _pool is None or _pool_workers < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _pool_workers = workers
+
+        return _pool
+
+
+def reset_pool(pool):
+    """
+    Drops a broken pool, so the next run starts a new one.
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def publish(key, population_fitness):
+    """
+    Writes a fitness engine once per catalog key to a file the workers load it from.
+
+    Tasks then carry the key and the path instead of the catalog. Every publish counts
+    one more run using the file until release(key), and a file is only deleted once no
+    run uses it and more than MAX_PUBLISHED unused files are kept.
+
+    Args:
+        key (str): Identifies the catalog version and requested types.
+        population_fitness (callable): The picklable fitness engine.
+
+    Returns:
+        str: The path of the file.
+    """
+    global _directory
+
+    with _pool_lock:
+        entry = _published.get(key)
+
+        if entry is None:
+            if _directory is None:
+                _directory = tempfile.mkdtemp(prefix="islands-")
+                atexit.register(shutil.rmtree, _directory, True)
+
+            path = os.path.join(_directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".pickle")
+            descriptor, temporary = tempfile.mkstemp(dir=_directory, suffix=".tmp")
+            with os.fdopen(descriptor, "wb") as output:
+                pickle.dump(population_fitness, output, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, path)
+            entry = _published[key] = [path, 0]
+
+        entry[1] += 1
+        _published.move_to_end(key)
+        return entry[0]
+
+
+def release(key):
+    """
+    Ends a run using the file of a key, deleting the least recently used unused files beyond MAX_PUBLISHED.
+    """
+    with _pool_lock:
+        entry = _published.get(key)
+        if entry is not None:
+            entry[1] -= 1
+
+        unused = [key for key, (path, runs) in _published.items() if runs <= 0]
+        for expired in unused[:max(len(unused) - MAX_PUBLISHED, 0)]:
+            path, runs = _published.pop(expired)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+class IslandModel:
+    """
+    A genetic algorithm that evolves several sub-populations in a process pool.
+
+    Every migration_interval generations the best genomes of each island replace the
+    worst genomes of the next island in a ring. All runs of a process share one pool,
+    and the fitness engine of a catalog is published once per key and loaded once by
+    every worker, so tasks only carry populations.
+
+    Attributes:
+        limits (list): A list of integer limits for genome generation.
+        population_fitness (callable): Scores a list of genomes, e.g. a BatchFitness. Must be picklable.
+        key (str): Identifies the catalog version and requested types scored by population_fitness.
+        workers (int): The number of islands and worker processes.
+        migration_interval (int): The number of generations between migrations.
+        migrants (int): The number of elite genomes sent to the next island.
+        generations_run (int): The number of generations run by all islands in the last run.
+    """
+
+    def __init__(self, limits, population_fitness, workers=4, migration_interval=4, migrants=2, key=None):
+        """
+        Initializes an IslandModel object.
+
+        Args:
+            limits (list): A list of integer limits for genome generation.
+            population_fitness (callable): Scores a list of genomes.
+            workers (int): The number of islands and worker processes.
+            migration_interval (int): The number of generations between migrations.
+            migrants (int): The number of elite genomes sent to the next island.
+            key (str): Identifies the catalog version and requested types, so runs on the same
+                catalog reuse what workers loaded. Without a key the engine is published per model.
+        """
+        self.limits = limits
+        self.population_fitness = population_fitness
+        self.workers = workers
+        self.migration_interval = max(migration_interval, 1)
+        self.migrants = migrants
+        self.key = key if key is not None else uuid.uuid4().hex
+        self.generations_run = 0
+
+    @staticmethod
+    def migrate(islands, migrants):
+        """
+        Replaces the worst genomes of every island with the best genomes of the previous one.
+
+        Args:
+            islands (list): (population, scores, ...) of every island, each sorted best first.
+            migrants (int): The number of genomes to move.
+
+        Returns:
+            list: The island populations after migration.
+        """
+        populations = []
+
+        for index, (population, scores, *rest) in enumerate(islands):
+            elites = islands[index - 1][0][:migrants]
+            populations.append(population[:len(population) - len(elites)] + [list(genome) for genome in elites])
+
+        return populations
+
+    def run(self, size, generation, deadline=None, hall_of_fame=None, seed=None, seeds=None):
+        """
+        Evolves all islands and merges them.
+
+        Args:
+            size (int): The population size of every island.
+            generation (int): The total number of generations of every island.
+            deadline (float): A time.monotonic() time after which no further epoch starts.
+            hall_of_fame (HallOfFame): Receives the best genomes of every generation of every
+                island, or None. Workers keep them in a hall of the same capacity and threshold.
+            seed (int): Seeds the random seeds of every island and epoch, so a run is reproducible.
+            seeds (list): Warm-start genomes, dealt in turn to the initial island populations.
+
+        Returns:
+            list: The genomes of all islands sorted by score, best first.
+        """
+        rng = random.Random(seed)
+        populations = [list((seeds or [])[index::self.workers]) for index in range(self.workers)]
+        islands = []
+        self.generations_run = 0
+
+        executor = process_pool(self.workers)
+        path = publish(self.key, self.population_fitness)
+        remaining = generation
+
+        try:
+            while remaining > 0:
+                generations = min(self.migration_interval, remaining)
+                futures = [
+                    executor.submit(
+                        evolve_island, self.key, path, self.limits, population, size, generations, rng.getrandbits(32),
+                        None if hall_of_fame is None else HallOfFame(hall_of_fame.capacity, hall_of_fame.threshold)
+                    )
+                    for population in populations
+                ]
+                islands = [future.result() for future in futures]
+
+                if hall_of_fame is not None:
+                    for population, scores, generations_run, elites in islands:
+                        for genome, score in elites:
+                            hall_of_fame.add(genome, score)
+                self.generations_run += sum(island[2] for island in islands)
+                remaining -= generations
+
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+
+                if remaining > 0:
+                    populations = self.migrate(islands, migrants=self.migrants)
+        except BrokenProcessPool:
+            reset_pool(executor)
+            raise
+        finally:
+            release(self.key)
+
+        merged = [(genome, score) for population, scores, *rest in islands for genome, score in zip(population, scores)]
+        merged.sort(key=lambda item: item[1], reverse=True)
+        return [genome for genome, score in merged]
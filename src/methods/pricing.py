@@ -0,0 +1,130 @@
+import numpy as np
+
+# Totals are sums of floats added in another order than the response price, so bounds allow this slack.
+TOLERANCE = 1e-9
+
+
+class PriceBounds:
+    """
+    A minimum and maximum total price of a combination, over genes ordered by cost.
+
+    Gene i of a product type is its i-th cheapest product, so lowering a gene never
+    raises the total price. The cost of a product is its price times the requirement
+    value, and the total price of a combination is the sum of its costs, as the price
+    of a recommendation.
+
+    Attributes:
+        costs (list): The ascending cost of every gene, one array per product type.
+        min_price (float): The lowest total price, -inf without a minimum.
+        max_price (float): The highest total price, inf without a maximum.
+    """
+
+    def __init__(self, costs, min_price=None, max_price=None):
+        """
+        Initializes a PriceBounds object.
+
+        Args:
+            costs (list): The ascending cost of every gene, one array per product type.
+            min_price (float): The lowest total price, or None.
+            max_price (float): The highest total price, or None.
+        """
+        self.costs = [np.asarray(cost, dtype=float) for cost in costs]
+        self.min_price = -np.inf if min_price is None else float(min_price)
+        self.max_price = np.inf if max_price is None else float(max_price)
+
+    def ranges(self):
+        """
+        Drops the genes of every product type that cannot be part of a feasible combination.
+
+        A gene is kept when it fits the maximum with the cheapest genes of every other type
+        and reaches the minimum with their most expensive genes. Costs are ascending, so
+        the kept genes of a type are one range.
+
+        Returns:
+            list: A (start, stop) gene range per product type, empty for every type when
+            no combination is feasible.
+        """
+        if any(len(cost) == 0 for cost in self.costs):
+            return [(0, 0)] * len(self.costs)
+
+        cheapest = sum(cost[0] for cost in self.costs)
+        dearest = sum(cost[-1] for cost in self.costs)
+        ranges = []
+
+        for cost in self.costs:
+            upper = self.max_price - (cheapest - cost[0]) + TOLERANCE
+            lower = self.min_price - (dearest - cost[-1]) - TOLERANCE
+            ranges.append((int(np.searchsorted(cost, lower, side="left")), int(np.searchsorted(cost, upper, side="right"))))
+
+        if any(start >= stop for start, stop in ranges):
+            return [(0, 0)] * len(self.costs)
+
+        return ranges
+
+    def trim(self, ranges):
+        """
+        Returns the bounds over the genes kept by ranges, renumbered from 0.
+        """
+        return PriceBounds(
+            [cost[start:stop] for cost, (start, stop) in zip(self.costs, ranges)],
+            min_price=self.min_price,
+            max_price=self.max_price
+        )
+
+    def totals(self, genomes):
+        """
+        Calculates the total price of every genome of a genome matrix.
+        """
+        totals = np.zeros(len(genomes))
+        for column, cost in enumerate(self.costs):
+            totals += cost[genomes[:, column]]
+        return totals
+
+    def feasible(self, genomes):
+        """
+        Tells which genomes of a genome matrix are within the bounds.
+
+        Returns:
+            numpy.ndarray: A boolean mask, one value per genome.
+        """
+        totals = self.totals(np.asarray(genomes, dtype=np.int64).reshape(len(genomes), -1))
+        return (totals >= self.min_price - TOLERANCE) & (totals <= self.max_price + TOLERANCE)
+
+    def repair(self, genomes, rng):
+        """
+        Moves the genes of out-of-bounds genomes, in place, until they are within the bounds.
+
+        Product types are visited in a random order. Over the maximum, each visited gene
+        is lowered just enough to cover the excess, down to the cheapest product. Under
+        the minimum, genes are raised the same way. Genomes that still miss the bounds,
+        because costs jump over the whole allowed range, are left for feasible() to prune.
+
+        Args:
+            genomes (numpy.ndarray): The genome matrix to repair.
+            rng (numpy.random.Generator): The random generator of the request.
+        """
+        if np.isfinite(self.max_price):
+            excess = self.totals(genomes) - self.max_price
+            for column in rng.permutation(genomes.shape[1]):
+                rows = np.nonzero(excess > TOLERANCE)[0]
+                if not len(rows):
+                    break
+                cost = self.costs[column]
+                current = cost[genomes[rows, column]]
+                genes = np.searchsorted(cost, current - excess[rows] + TOLERANCE, side="right") - 1
+                genes = np.minimum(np.maximum(genes, 0), genomes[rows, column])
+                excess[rows] -= current - cost[genes]
+                genomes[rows, column] = genes
+
+        if np.isfinite(self.min_price):
+            deficit = self.min_price - self.totals(genomes)
+            for column in rng.permutation(genomes.shape[1]):
+                rows = np.nonzero(deficit > TOLERANCE)[0]
+                if not len(rows):
+                    break
+                cost = self.costs[column]
+                current = cost[genomes[rows, column]]
+                genes = np.searchsorted(cost, current + deficit[rows] - TOLERANCE, side="left")
+                genes = np.maximum(np.minimum(genes, len(cost) - 1), genomes[rows, column])
+                deficit[rows] -= cost[genes] - current
+                genomes[rows, column] = genes
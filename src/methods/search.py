@@ -0,0 +1,119 @@
+import time
+
+import numpy as np
+
+
+class ExactSearch:
+    """
+    A class for scoring every combination of a small search space.
+
+    Combinations are enumerated in mixed radix order (the first product type is the
+    most significant digit) and scored in chunks by a population fitness function, so
+    the best combinations are found exactly instead of sampled by the genetic algorithm.
+    With a feasible function, combinations it rejects are dropped before scoring.
+
+    Attributes:
+        limits (list): The highest product index of every product type.
+        population_fitness (callable): Scores a genome matrix, e.g. BatchFitness.evaluate.
+        chunk_size (int): The number of combinations scored at once.
+        feasible (callable): Masks the genome rows worth scoring, e.g. PriceBounds.feasible, or None.
+        evaluated (int): The number of combinations scored by the last run.
+    """
+
+    def __init__(self, limits, population_fitness, chunk_size=8192, feasible=None):
+        """
+        Initializes an ExactSearch object.
+
+        Args:
+            limits (list): The highest product index of every product type.
+            population_fitness (callable): Scores a genome matrix and returns one score per row.
+            chunk_size (int): The number of combinations scored at once.
+            feasible (callable): Masks the genome rows worth scoring, or None to score all.
+        """
+        self.limits = limits
+        self.population_fitness = population_fitness
+        self.chunk_size = chunk_size
+        self.feasible = feasible
+        self.evaluated = 0
+
+    def size(self):
+        """
+        Calculates the number of combinations in the search space.
+
+        Returns:
+            int: The number of combinations, 0 when a product type has no products.
+        """
+        size = 1
+        for limit in self.limits:
+            size *= max(limit + 1, 0)
+        return size
+
+    def genomes(self, start, stop):
+        """
+        Decodes a range of combination numbers into genomes.
+
+        Args:
+            start (int): The first combination number.
+            stop (int): The combination number after the last one.
+
+        Returns:
+            numpy.ndarray: The genome matrix, one row per combination.
+        """
+        numbers = np.arange(start, stop, dtype=np.int64)
+        columns = []
+
+        for limit in reversed(self.limits):
+            columns.append(numbers % (limit + 1))
+            numbers = numbers // (limit + 1)
+
+        return np.stack(columns[::-1], axis=1) if columns else np.zeros((stop - start, 0), dtype=np.int64)
+
+    def run(self, threshold, pool_size, time_budget=None, hall_of_fame=None):
+        """
+        Scores the whole search space and keeps the best combinations above the threshold.
+
+        Args:
+            threshold (float): The score a combination must exceed to be kept.
+            pool_size (int): The maximum number of combinations returned.
+            time_budget (float): Seconds the search may take. The search gives up as soon as
+                the first chunk shows it would run longer.
+            hall_of_fame (HallOfFame): Receives the kept combinations and their scores, or None.
+
+        Returns:
+            list: The kept genomes ordered by score, best first, or None when the search
+            would exceed the time budget.
+        """
+        size = self.size()
+        self.evaluated = 0
+        started = time.perf_counter()
+        best_genomes = np.zeros((0, len(self.limits)), dtype=np.int64)
+        best_scores = np.zeros(0)
+
+        for start in range(0, size, self.chunk_size):
+            stop = min(start + self.chunk_size, size)
+            genomes = self.genomes(start, stop)
+            if self.feasible is not None:
+                genomes = genomes[self.feasible(genomes)]
+            scores = np.asarray(self.population_fitness(genomes), dtype=float) if len(genomes) else np.zeros(0)
+            self.evaluated += len(genomes)
+            kept = scores > threshold
+
+            best_genomes = np.concatenate([best_genomes, genomes[kept]])
+            best_scores = np.concatenate([best_scores, scores[kept]])
+
+            # A stable sort keeps enumeration order between equal scores.
+            order = np.argsort(-best_scores, kind="stable")[:pool_size]
+            best_genomes = best_genomes[order]
+            best_scores = best_scores[order]
+
+            if time_budget is not None:
+                elapsed = time.perf_counter() - started
+                if elapsed * size / stop > time_budget and stop < size:
+                    return None
+
+        genomes = [[int(gene) for gene in genome] for genome in best_genomes]
+
+        if hall_of_fame is not None:
+            hall_of_fame.offer(genomes, best_scores)
+
+        return genomes
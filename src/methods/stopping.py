@@ -0,0 +1,144 @@
+import math
+import time
+
+
+def evolution_parameters(space_size, min_size=12, max_size=48, min_generation=16, max_generation=48):
+    """
+    Scales the population size and generation count of the genetic algorithm with the search space.
+
+    Both grow by four per order of magnitude of the space, starting from the historical
+    12 genomes and 16 generations, and stop at their maximums. Spaces smaller than the
+    population need no larger population than the space itself.
+
+    Args:
+        space_size (int): The number of combinations in the search space.
+        min_size (int): The smallest population size.
+        max_size (int): The largest population size.
+        min_generation (int): The smallest generation count.
+        max_generation (int): The largest generation count.
+
+    Returns:
+        tuple: The population size, always even, and the generation count.
+    """
+    magnitude = math.ceil(math.log10(max(space_size, 1)))
+    size = min(max(4 * magnitude, min_size), max_size)
+    generation = min(max(4 * magnitude, min_generation), max_generation)
+
+    if space_size < size:
+        size = max(space_size + space_size % 2, 2)
+
+    return size + size % 2, generation
+
+
+class StoppingCriteria:
+    """
+    Decides when the genetic algorithm has done enough work for a request.
+
+    Evolution stops at the first generation that meets any of these criteria:
+
+    - the deadline passed,
+    - the best score did not improve by more than tolerance for patience generations,
+    - the population holds target distinct genomes scoring above threshold, distinct
+      meaning fewer than similarity equal positions, as in SimilarityChecker.
+
+    Attributes:
+        deadline (float): A time.monotonic() time, or None for no deadline.
+        patience (int): Generations without improvement before stopping, or None.
+        target (int): Distinct qualifying genomes to stop at, or None.
+        threshold (float): The score a genome must exceed to qualify.
+        similarity (int): The number of equal positions that makes two genomes similar.
+        tolerance (float): The smallest improvement of the best score that counts.
+        reason (str): The criterion that stopped the last run, or None.
+    """
+
+    def __init__(self, deadline=None, patience=None, target=None, threshold=0.93, similarity=3, tolerance=1e-6):
+        """
+        Initializes a StoppingCriteria object.
+
+        Args:
+            deadline (float): A time.monotonic() time, or None for no deadline.
+            patience (int): Generations without improvement before stopping, or None.
+            target (int): Distinct qualifying genomes to stop at, or None.
+            threshold (float): The score a genome must exceed to qualify.
+            similarity (int): The number of equal positions that makes two genomes similar.
+            tolerance (float): The smallest improvement of the best score that counts.
+        """
+        self.deadline = deadline
+        self.patience = patience
+        self.target = target
+        self.threshold = threshold
+        self.similarity = similarity
+        self.tolerance = tolerance
+        self.reason = None
+        self._best = None
+        self._stale = 0
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self):
+        """
+        Returns the seconds left before the deadline, or None without a deadline.
+        """
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def distinct(self, population, scores):
+        """
+        Counts the distinct genomes scoring above the threshold in a ranked population.
+
+        Args:
+            population (list): The genomes, best first.
+            scores (list): Their scores.
+
+        Returns:
+            int: The number of distinct qualifying genomes, counted up to target.
+        """
+        kept = []
+
+        for genome, score in zip(population, scores):
+            if score <= self.threshold or len(kept) >= self.target:
+                break
+            if all(sum(1 for x, y in zip(genome, other) if x == y) < self.similarity for other in kept):
+                kept.append(genome)
+
+        return len(kept)
+
+    def update(self, population, scores):
+        """
+        Records a ranked generation and tells whether evolution should stop after it.
+
+        Args:
+            population (list): The genomes of the generation, best first.
+            scores (list): Their scores.
+
+        Returns:
+            bool: True when a stopping criterion is met. The criterion is kept in reason.
+        """
+        best = float(scores[0]) if len(scores) else 0.0
+
+        if self._best is None or best > self._best + self.tolerance:
+            self._best = best
+            self._stale = 0
+        else:
+            self._stale += 1
+
+        if self.expired():
+            self.reason = "deadline"
+        elif self.target is not None and self.distinct(population, scores) >= self.target:
+            self.reason = "target"
+        elif self.patience is not None and self._stale >= self.patience:
+            self.reason = "stagnation"
+        else:
+            return False
+
+        return True
+
+    def reset(self):
+        """
+        Forgets the best score of the previous run, keeping the deadline.
+        """
+        self.reason = None
+        self._best = None
+        self._stale = 0
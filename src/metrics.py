@@ -0,0 +1,207 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+
+class Metric:
+    """
+    Base class of the metrics exposed in the Prometheus text format.
+
+    Attributes:
+        name (str): The metric name.
+        help (str): The help text of the metric.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def format_labels(labels):
+        if not labels:
+            return ""
+        return "{%s}" % ",".join('%s="%s"' % (key, str(value).replace('"', '\\"')) for key, value in labels)
+
+    def samples(self):
+        """
+        Returns the samples of the metric.
+
+        Returns:
+            list: (sample name, labels, value) tuples, labels being sorted (key, value) pairs.
+        """
+        raise NotImplementedError("Subclasses must implement the samples method")
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s %s" % (self.name, self.type)]
+        for name, labels, value in self.samples():
+            lines.append("%s%s %s" % (name, self.format_labels(labels), repr(float(value))))
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """
+    A monotonically increasing count, optionally split by labels.
+    """
+
+    type = "counter"
+
+    def __init__(self, name, help):
+        super().__init__(name, help)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    """
+    Observations counted into cumulative buckets, optionally split by labels.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, help, buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for labels, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    samples.append((self.name + "_bucket", labels + (("le", bound),), count))
+                samples.append((self.name + "_sum", labels, total))
+                samples.append((self.name + "_count", labels, counts[-1]))
+        return samples
+
+
+class Gauge(Metric):
+    """
+    A value read from a callback when the metrics are rendered.
+
+    The callback returns a dictionary of label dictionaries, as sorted tuples, to values.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, help, function):
+        super().__init__(name, help)
+        self.function = function
+
+    def samples(self):
+        return [(self.name, labels, value) for labels, value in sorted(self.function().items())]
+
+
+class Registry:
+    """
+    The collection of metrics rendered by the /metrics endpoint.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "generate_stage_seconds",
+    "Time spent in each stage of a recommendation request."
+))
+FITNESS_EVALUATIONS = registry.register(Counter(
+    "fitness_evaluations_total",
+    "Genomes scored by the fitness function."
+))
+GENERATIONS = registry.register(Counter(
+    "ga_generations_total",
+    "Generations run by the genetic algorithm."
+))
+GA_STOPS = registry.register(Counter(
+    "ga_stops_total",
+    "Evolution runs by the criterion that stopped them."
+))
+
+
+def cache_gauges(caches):
+    """
+    Registers hit, miss and hit ratio gauges for named caches exposing hits, misses and hit_ratio().
+
+    Args:
+        caches (dict): Cache name to a function returning the cache.
+    """
+    def values(read):
+        return lambda: {(("cache", name),): read(get_cache()) for name, get_cache in caches.items()}
+
+    registry.register(Gauge("cache_hits", "Lookups answered from the cache.", values(lambda cache: cache.hits)))
+    registry.register(Gauge("cache_misses", "Lookups that missed the cache.", values(lambda cache: cache.misses)))
+    registry.register(Gauge("cache_hit_ratio", "Share of lookups answered from the cache.",
+                            values(lambda cache: cache.hit_ratio())))
+
+
+def executor_gauges(executor):
+    """
+    Registers gauges of the jobs of a JobExecutor and of the jobs it refused.
+    """
+    registry.register(Gauge("search_jobs", "Searches running or waiting for a worker.", lambda: {
+        (("state", "running"),): executor.running,
+        (("state", "queued"),): executor.queued,
+    }))
+    registry.register(Gauge("search_jobs_rejected", "Searches refused because every worker and queue slot was taken.",
+                            lambda: {(): executor.rejected}))
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a block into the stage histogram and, inside a request, into the request timings.
+
+    Args:
+        name (str): The stage name.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+
+        if has_request_context():
+            g.setdefault("stage_timings", []).append((name, elapsed))
+
+
+def server_timing():
+    """
+    Formats the stage timings of the current request as a Server-Timing header value.
+
+    Returns:
+        str: For example "validate_key;dur=0.42, search;dur=18.10", durations in milliseconds.
+    """
+    return ", ".join("%s;dur=%.2f" % (name, elapsed * 1000) for name, elapsed in g.get("stage_timings", []))
@@ -0,0 +1,140 @@
+"""
+Response encoding: a fast JSON encoder and the compact recommendation format.
+
+orjson is used when it is installed, otherwise the standard json module without
+indentation or key sorting. Every response is encoded by dumps, Flask responses
+through JSONProvider, so values such as dates read the same on every route.
+"""
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date
+
+import numpy
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    # The types of the Flask JSON provider, encoded the same way, e.g. Firestore
+    # timestamps as HTTP dates, plus numpy scalars and arrays.
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    if isinstance(value, numpy.generic):
+        return value.item()
+    if isinstance(value, numpy.ndarray):
+        return value.tolist()
+    raise TypeError("Object of type %s is not JSON serializable" % type(value).__name__)
+
+
+def dumps(value):
+    """
+    Encodes a value as compact UTF-8 JSON.
+
+    Returns:
+        bytes: The JSON document.
+    """
+    if orjson is not None:
+        # orjson would write dates as ISO 8601, so they are passed to _default as well, and
+        # non-string keys are converted as the json module does.
+        return orjson.dumps(value, default=_default, option=(
+            orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+            | orjson.OPT_NON_STR_KEYS
+        ))
+
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    The Flask JSON provider encoding with dumps, used by jsonify() and flask.json.dumps().
+    """
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode("utf-8")
+
+
+def parse_fields(value):
+    """
+    Parses a comma separated fields= argument.
+
+    Returns:
+        list: The field names, or None to keep every field.
+    """
+    if not value:
+        return None
+
+    return [field.strip() for field in value.split(",") if field.strip()]
+
+
+def project(product, fields):
+    """
+    Returns a product with only the given fields, always keeping its id.
+    """
+    if fields is None:
+        return product
+
+    return {field: product[field] for field in ["id"] + fields if field in product}
+
+
+class ProductTable:
+    """
+    The products shared by compact recommendations, keyed by product id.
+
+    A product referenced by several recommendations, or by several results of a batch,
+    is stored once. Compact recommendations name their products by id instead.
+
+    Attributes:
+        fields (list): The product fields kept in the table, or None for every field.
+        products (dict): The projected products by id.
+    """
+
+    def __init__(self, fields=None):
+        self.fields = fields
+        self.products = {}
+
+    def reference(self, product):
+        """
+        Adds a product to the table.
+
+        Returns:
+            str: The product id.
+        """
+        product_id = str(product.get("id"))
+
+        if product_id not in self.products:
+            self.products[product_id] = project(product, self.fields)
+
+        return product_id
+
+    def compact(self, recommendation):
+        """
+        Returns a recommendation whose products are ids into the table.
+        """
+        return dict(recommendation, products={
+            key: self.reference(product) for key, product in recommendation["products"].items()
+        })
+
+
+def full_recommendation(recommendation, fields=None):
+    """
+    Returns a recommendation with its embedded products projected to fields.
+    """
+    if fields is None:
+        return recommendation
+
+    return dict(recommendation, products={
+        key: project(product, fields) for key, product in recommendation["products"].items()
+    })
@@ -0,0 +1,358 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+from methods.colorsimilarity import ColorProfile
+from serialization import dumps
+
+# File layout: MAGIC, the footer offset and length as little endian uint64, the columns
+# at ALIGNMENT byte boundaries, then a JSON footer describing the catalog and every column.
+MAGIC = b"CATSNAP1"
+PREFIX = struct.Struct("<8sQQ")
+ALIGNMENT = 64
+
+
+def write_snapshot(path, brand, version, products, gray_threshold=12):
+    """
+    Writes a converted brand catalog as a columnar snapshot file.
+
+    Colors are parsed once here, as in ProductFeatureIndex, and stored as RGB, HSV and
+    gray flag columns. Prices are stored as floats, NaN when missing or not a number.
+    Every product is also kept as JSON for its other attributes, decoded on access only.
+    Values JSON cannot encode, such as Firestore timestamps, are stored as responses
+    encode them, and other types raise TypeError as they would in a response.
+    The file is written next to path and renamed over it, so readers never see a
+    partial file.
+
+    Args:
+        path (str): The snapshot file path.
+        brand (str): The brand of the catalog.
+        version (str): The catalog version, see CatalogEntry.
+        products (dict): The converted catalog, product type to list of products.
+        gray_threshold (int): The threshold for identifying grayscale.
+    """
+    items = [product for values in products.values() for product in values]
+    count = len(items)
+
+    rgb = np.zeros((count, 3), dtype=np.uint8)
+    hsv = np.zeros((count, 3))
+    gray = np.zeros(count, dtype=bool)
+    known = np.zeros(count, dtype=bool)
+    prices = np.full(count, np.nan)
+
+    for index, product in enumerate(items):
+        profile = ColorProfile.parse((product.get('color') or [None])[0], threshold=gray_threshold)
+        if profile is not None:
+            rgb[index] = profile.rgb
+            hsv[index] = profile.hsv
+            gray[index] = profile.is_gray
+            known[index] = True
+
+        try:
+            prices[index] = float(product['price'])
+        except (KeyError, TypeError, ValueError):
+            pass
+
+    ids, id_offsets = _blob([str(product.get('id', '')).encode("utf-8") for product in items])
+    attributes, attribute_offsets = _blob([dumps(product) for product in items])
+
+    columns = {
+        "type_offsets": np.cumsum([0] + [len(values) for values in products.values()], dtype=np.int64),
+        "prices": prices,
+        "rgb": rgb,
+        "hsv": hsv,
+        "gray": gray,
+        "known": known,
+        "ids": ids,
+        "id_offsets": id_offsets,
+        "attributes": attributes,
+        "attribute_offsets": attribute_offsets,
+    }
+
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+    try:
+        with os.fdopen(descriptor, "wb") as output:
+            output.write(b"\0" * PREFIX.size)
+            layout = {}
+
+            for name, column in columns.items():
+                output.write(b"\0" * (-output.tell() % ALIGNMENT))
+                layout[name] = {"dtype": column.dtype.str, "shape": list(column.shape), "offset": output.tell()}
+                output.write(np.ascontiguousarray(column).tobytes())
+
+            footer = json.dumps({
+                "brand": brand,
+                "version": version,
+                "gray_threshold": gray_threshold,
+                "types": list(products.keys()),
+                "columns": layout,
+            }).encode("utf-8")
+            footer_offset = output.tell()
+            output.write(footer)
+            output.seek(0)
+            output.write(PREFIX.pack(MAGIC, footer_offset, len(footer)))
+
+        os.replace(temporary, path)
+
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _blob(values):
+    """
+    Concatenates byte strings into one uint8 array and their int64 boundary offsets.
+    """
+    offsets = np.cumsum([0] + [len(value) for value in values], dtype=np.int64)
+    return np.frombuffer(b"".join(values), dtype=np.uint8), offsets
+
+
+class CatalogSnapshot:
+    """
+    A read-only, memory-mapped columnar brand catalog.
+
+    The columns are numpy views straight into the mapping, so every process that opens
+    the same file shares its pages, and opening a catalog costs one mmap. The products
+    and features attributes stand in for the products dictionary and ProductFeatureIndex
+    of a CatalogEntry.
+
+    Attributes:
+        path (str): The snapshot file path.
+        brand (str): The brand of the catalog.
+        version (str): The catalog version.
+        types (list): The product types, in catalog order.
+        type_offsets (numpy.ndarray): Where the products of every type start, plus the total count.
+        prices, rgb, hsv, gray, known (numpy.ndarray): One row per product, all types concatenated.
+    """
+
+    def __init__(self, path):
+        """
+        Opens and maps a snapshot file.
+
+        Args:
+            path (str): The snapshot file path.
+
+        Raises:
+            ValueError: When the file is not a catalog snapshot.
+        """
+        self.path = path
+
+        with open(path, "rb") as source:
+            self._mapping = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, footer_offset, footer_length = PREFIX.unpack_from(self._mapping, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a catalog snapshot: %s" % path)
+
+        footer = json.loads(self._mapping[footer_offset:footer_offset + footer_length])
+        self.brand = footer["brand"]
+        self.version = footer["version"]
+        self.gray_threshold = footer["gray_threshold"]
+        self.types = footer["types"]
+
+        for name, column in footer["columns"].items():
+            dtype = np.dtype(column["dtype"])
+            count = int(np.prod(column["shape"]))
+            array = np.frombuffer(self._mapping, dtype=dtype, count=count, offset=column["offset"])
+            setattr(self, name, array.reshape(column["shape"]))
+
+        self.products = SnapshotProducts(self)
+        self.features = SnapshotFeatureIndex(self)
+
+    def type_range(self, key):
+        """
+        Returns the first and past-the-end product rows of a product type.
+        """
+        index = self.types.index(key)
+        return int(self.type_offsets[index]), int(self.type_offsets[index + 1])
+
+    def type_prices(self, key):
+        start, stop = self.type_range(key)
+        return self.prices[start:stop]
+
+    def type_ids(self, key):
+        start, stop = self.type_range(key)
+        return [self.product_id(row) for row in range(start, stop)]
+
+    def product_id(self, row):
+        return self.ids[self.id_offsets[row]:self.id_offsets[row + 1]].tobytes().decode("utf-8")
+
+    def product(self, row):
+        """
+        Decodes every attribute of one product.
+
+        Returns:
+            dict: A new dictionary, as the product was stored in Firestore.
+        """
+        return json.loads(self.attributes[self.attribute_offsets[row]:self.attribute_offsets[row + 1]].tobytes())
+
+
+class SnapshotProducts(Mapping):
+    """
+    The product types of a snapshot as a read-only mapping of type to product list.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __getitem__(self, key):
+        if key not in self.snapshot.types:
+            raise KeyError(key)
+        return SnapshotProductList(self.snapshot, *self.snapshot.type_range(key))
+
+    def __iter__(self):
+        return iter(self.snapshot.types)
+
+    def __len__(self):
+        return len(self.snapshot.types)
+
+
+class SnapshotProductList(Sequence):
+    """
+    The products of one type, decoded from the snapshot one at a time when accessed.
+    """
+
+    def __init__(self, snapshot, start, stop):
+        self.snapshot = snapshot
+        self.start = start
+        self.stop = stop
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.snapshot.product(self.start + index)
+
+    def __len__(self):
+        return self.stop - self.start
+
+
+class SnapshotFeatureIndex:
+    """
+    The ProductFeatureIndex of a snapshot, read from its color columns.
+
+    Profiles for the scalar fitness function are built from the stored RGB on first use
+    and kept, giving the same HSV and gray flag as profiles parsed from the hex color.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._profiles = {}
+
+    def columns(self, key):
+        start, stop = self.snapshot.type_range(key)
+        return self.snapshot.hsv[start:stop], self.snapshot.gray[start:stop], self.snapshot.known[start:stop]
+
+    def get_profiles_by_genome(self, genome, product_types):
+        profiles = []
+
+        for key, gene in zip(product_types, genome):
+            start, stop = self.snapshot.type_range(key)
+            row = start + gene
+            if 0 <= gene < stop - start and self.snapshot.known[row]:
+                profile = self._profiles.get(row)
+                if profile is None:
+                    profile = ColorProfile("%02X%02X%02X" % tuple(self.snapshot.rgb[row]),
+                                           threshold=self.snapshot.gray_threshold)
+                    self._profiles[row] = profile
+                profiles.append(profile)
+
+        return profiles
+
+
+class SnapshotStore:
+    """
+    A directory of catalog snapshots shared by every worker process of the host.
+
+    The worker that loads a catalog writes its snapshot and a pointer file naming the
+    current version of the brand. Other workers map the current snapshot while the
+    pointer is younger than ttl seconds instead of reading the catalog again. File
+    names are derived from a hash of the brand, never from the brand itself.
+
+    Attributes:
+        directory (str): The snapshot directory.
+        ttl (float): How long, in seconds, a written snapshot is served without reloading.
+    """
+
+    def __init__(self, directory, ttl=300.0):
+        self.directory = directory
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _name(self, brand):
+        return hashlib.sha1(brand.encode("utf-8")).hexdigest()[:20]
+
+    def path(self, brand, version):
+        return os.path.join(self.directory, "%s-%s.snapshot" % (self._name(brand), version))
+
+    def pointer(self, brand):
+        return os.path.join(self.directory, "%s.current" % self._name(brand))
+
+    def current(self, brand):
+        """
+        Maps the current snapshot of a brand.
+
+        Returns:
+            CatalogSnapshot: The snapshot, or None when there is none or it is older than ttl.
+        """
+        try:
+            if time.time() - os.path.getmtime(self.pointer(brand)) > self.ttl:
+                return None
+            with open(self.pointer(brand)) as pointer:
+                version = pointer.read().strip()
+            return CatalogSnapshot(self.path(brand, version))
+        except (OSError, ValueError):
+            return None
+
+    def save(self, brand, version, products):
+        """
+        Writes a snapshot of a brand catalog, makes it current and maps it.
+
+        Snapshots of older versions are deleted. Processes still mapping them keep
+        their pages until they unmap.
+
+        Returns:
+            CatalogSnapshot: The new snapshot.
+        """
+        path = self.path(brand, version)
+
+        with self._lock:
+            write_snapshot(path, brand=brand, version=version, products=products)
+
+            descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(descriptor, "w") as pointer:
+                pointer.write(version)
+            os.replace(temporary, self.pointer(brand))
+
+            prefix = self._name(brand) + "-"
+            for name in os.listdir(self.directory):
+                if name.startswith(prefix) and name.endswith(".snapshot") and os.path.join(self.directory, name) != path:
+                    try:
+                        os.unlink(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+        return CatalogSnapshot(path)
+
+    def expire(self, brand):
+        """
+        Stops serving the current snapshot of a brand, so the next load reads the catalog.
+        """
+        try:
+            os.unlink(self.pointer(brand))
+        except OSError:
+            pass
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the service modules the same way gunicorn does, from src/.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
@@ -0,0 +1,86 @@
+"""
+Synthetic catalogs and request helpers shared by the tests.
+"""
+import json
+import random
+
+
+def make_catalog(types, products_per_type, seed=0, gray_ratio=0.3):
+    """
+    Builds a brand catalog in the shape of the Firestore "products" document.
+
+    Returns:
+        list: One {type id: [product, ...]} dictionary per product type.
+    """
+    rng = random.Random(seed)
+    catalog = []
+
+    for index in range(types):
+        products = []
+        for product in range(products_per_type):
+            if rng.random() < gray_ratio:
+                level = rng.randint(0, 255)
+                red, green, blue = (min(max(level + rng.randint(-6, 6), 0), 255) for _ in range(3))
+            else:
+                red, green, blue = rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)
+
+            products.append({
+                "id": "type%d-%d" % (index, product),
+                "name": "Product %d" % product,
+                "price": str(rng.randint(5, 200)),
+                "color": [("#" if rng.random() < 0.5 else "") + "%02X%02X%02X" % (red, green, blue)],
+            })
+        catalog.append({"type%d" % index: products})
+
+    return catalog
+
+
+class FakeClock:
+    """
+    A clock that only moves when now is set, for TTLCache expiry tests.
+    """
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_requirements(types):
+    return [{"id": "type%d" % index, "value": 1} for index in range(types)]
+
+
+async def asgi_request(application, method, path, body=None, headers=None, query_string=b""):
+    """
+    Sends one HTTP request to an ASGI application.
+
+    Returns:
+        tuple: The status, the response headers as a dictionary and the body.
+    """
+    messages = [{"type": "http.request", "body": json.dumps(body).encode() if body is not None else b""}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string,
+        "headers": [(name.encode(), value.encode()) for name, value in (headers or {}).items()],
+        "server": ("testserver", 80),
+        "client": ("testclient", 1),
+    }
+    await application(scope, receive, send)
+
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    return sent[0]["status"], dict(sent[0]["headers"]), body
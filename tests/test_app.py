@@ -0,0 +1,112 @@
+"""
+Checks the Flask routes offline, against the in-memory catalog backend.
+"""
+import datetime
+import json
+import unittest
+from unittest import mock
+
+import app
+import database
+from cache import ResultCache, WarmStartStore
+from database import CachedKeyValidator, CatalogCache, InMemoryCatalogBackend
+
+from helpers import make_catalog, make_requirements
+
+
+class GenerateTest(unittest.TestCase):
+    headers = {"brand": "brand", "secret-key": "key"}
+
+    def setUp(self):
+        validator = CachedKeyValidator(validator=None)
+        validator.remember("key", True)
+        validator.remember("wrong", False)
+        self.backend = InMemoryCatalogBackend({"brand": make_catalog(4, 6)})
+        patches = [
+            mock.patch.object(app, "catalog_cache", CatalogCache(self.backend)),
+            mock.patch.object(database, "key_validator", validator),
+            mock.patch.object(app, "result_cache", ResultCache()),
+            mock.patch.object(app, "warm_starts", WarmStartStore()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client = app.app.test_client()
+
+    def generate(self, query="", headers=None, seed=1):
+        return self.client.post(
+            "/generate" + query,
+            json={"requirements": make_requirements(4), "seed": seed},
+            headers=headers or self.headers
+        )
+
+    def test_full_recommendations(self):
+        response = self.generate()
+        catalog = {product["id"]: product for products in make_catalog(4, 6) for values in products.values()
+                   for product in values}
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json)
+        for recommendation in response.json:
+            self.assertEqual(sorted(recommendation["products"]), ["type0", "type1", "type2", "type3"])
+            self.assertGreater(recommendation["score"], 0.93)
+            products = recommendation["products"].values()
+            self.assertTrue(all(product == catalog[product["id"]] for product in products))
+            self.assertAlmostEqual(recommendation["price"], sum(float(product["price"]) for product in products))
+
+    def test_compact_recommendations_share_products(self):
+        full = self.generate().json
+        compact = self.generate("?format=compact&fields=name").json
+
+        self.assertEqual([item["score"] for item in compact["recommendations"]], [item["score"] for item in full])
+        for item in compact["recommendations"]:
+            for product_id in item["products"].values():
+                self.assertEqual(sorted(compact["products"][product_id]), ["id", "name"])
+
+    def test_same_seed_same_recommendations(self):
+        first = self.generate(seed=5).json
+        app.result_cache.results.clear()
+
+        self.assertEqual(
+            [sorted(product["id"] for product in item["products"].values()) for item in self.generate(seed=5).json],
+            [sorted(product["id"] for product in item["products"].values()) for item in first]
+        )
+        self.assertEqual(self.backend.fetch_count, 1)
+
+    def test_dates_read_the_same_in_every_format(self):
+        catalog = make_catalog(4, 6)
+        for products in catalog:
+            for values in products.values():
+                for product in values:
+                    product["added"] = datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc)
+        self.backend.catalogs["brand"] = catalog
+
+        full = self.generate().json
+        compact = self.generate("?format=compact").json
+        stream = self.client.post(
+            "/generate/stream", json={"requirements": make_requirements(4), "seed": 1}, headers=self.headers
+        )
+        lines = [json.loads(line) for line in stream.data.decode().splitlines()]
+
+        dates = [product["added"] for item in full for product in item["products"].values()]
+        dates += [product["added"] for product in compact["products"].values()]
+        dates += [product["added"] for line in lines[:-1] for product in line["recommendation"]["products"].values()]
+        self.assertEqual(set(dates), {"Wed, 01 May 2024 12:30:00 GMT"})
+        self.assertEqual(len(lines), len(full) + 1)
+
+    def test_invalid_key(self):
+        response = self.generate(headers={"brand": "brand", "secret-key": "wrong"})
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.backend.fetch_count, 0)
+
+    def test_unknown_brand_answers_an_error(self):
+        with self.assertLogs(level="ERROR"):
+            response = self.generate(headers={"brand": "missing", "secret-key": "key"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("error", response.json)
+
+
+if __name__ == "__main__":
+    unittest.main()
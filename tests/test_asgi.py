@@ -0,0 +1,90 @@
+"""
+Checks the asyncio serving mode against the in-memory backend.
+"""
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+import asgi
+from cache import AsyncSingleFlight
+from database import AsyncInMemoryBackend, CachedKeyValidator, CatalogCache, InMemoryCatalogBackend
+
+from helpers import asgi_request, make_catalog, make_requirements
+
+
+class AsyncAppTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.backend = AsyncInMemoryBackend({"brand": make_catalog(4, 6)}, keys={"key"}, latency=0.01)
+        self.catalogs = CatalogCache(backend=InMemoryCatalogBackend())
+        patches = [
+            mock.patch.object(asgi, "catalog_cache", self.catalogs),
+            mock.patch.object(asgi, "key_validator", CachedKeyValidator(validator=None)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.application = asgi.AsyncApp(backend=self.backend)
+
+    async def generate(self, key, seed=1):
+        return await asgi_request(
+            self.application, "POST", "/generate",
+            body={"requirements": make_requirements(4), "seed": seed},
+            headers={"brand": "brand", "secret-key": key}
+        )
+
+    async def test_generate(self):
+        status, headers, body = await self.generate("key")
+
+        self.assertEqual(status, 200)
+        self.assertTrue(all(item["products"] for item in json.loads(body)))
+        self.assertEqual(self.backend.fetch_count, 1)
+
+    async def test_invalid_key_neither_fetches_nor_caches(self):
+        fetch = self.backend.fetch
+
+        async def slow_fetch(brand):
+            await asyncio.sleep(0.05)
+            return await fetch(brand)
+
+        with mock.patch.object(self.backend, "fetch", slow_fetch):
+            status, headers, body = await self.generate("wrong")
+            await asyncio.sleep(0.1)
+
+        self.assertEqual(status, 401)
+        self.assertEqual(self.backend.fetch_count, 0)
+        self.assertIsNone(self.catalogs.entries.get("brand"))
+
+    async def test_concurrent_misses_share_one_fetch(self):
+        responses = await asyncio.gather(*[self.generate("key", seed=seed) for seed in range(4)])
+
+        self.assertEqual([status for status, headers, body in responses], [200] * 4)
+        self.assertEqual(self.backend.fetch_count, 1)
+
+
+class AsyncSingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def test_call_is_cancelled_with_its_last_caller(self):
+        flight = AsyncSingleFlight()
+        started, finished = asyncio.Event(), []
+
+        async def work():
+            started.set()
+            await asyncio.sleep(1)
+            finished.append(True)
+
+        callers = [asyncio.ensure_future(flight.do("key", work)) for _ in range(2)]
+        await started.wait()
+
+        callers[0].cancel()
+        await asyncio.sleep(0)
+        self.assertIn("key", flight._calls)
+
+        callers[1].cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        self.assertNotIn("key", flight._calls)
+        self.assertEqual(finished, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
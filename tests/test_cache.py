@@ -0,0 +1,147 @@
+"""
+Checks the in-process caches.
+"""
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import ResultCache, SingleFlight, TTLCache, WarmStartStore
+
+from helpers import FakeClock
+
+
+class TTLCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(max_size=2, ttl=10.0, clock=self.clock)
+
+    def test_entries_expire_after_their_ttl(self):
+        self.cache.set("default", 1)
+        self.cache.set("short", 2, ttl=1.0)
+
+        self.clock.now = 0.5
+        self.assertEqual((self.cache.get("default"), self.cache.get("short")), (1, 2))
+        self.clock.now = 1.0
+        self.assertIsNone(self.cache.get("short"))
+        self.assertNotIn("short", self.cache)
+        self.clock.now = 10.0
+        self.assertEqual(self.cache.get("default", "gone"), "gone")
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+
+        self.assertIn("a", self.cache)
+        self.assertNotIn("b", self.cache)
+        self.assertIn("c", self.cache)
+
+    def test_set_renews_an_entry(self):
+        self.cache.set("a", 1)
+        self.clock.now = 8.0
+        self.cache.set("a", 2)
+        self.clock.now = 15.0
+
+        self.assertEqual(self.cache.get("a"), 2)
+
+    def test_counts_hits_and_misses(self):
+        self.assertEqual(self.cache.hit_ratio(), 0.0)
+        self.cache.set("a", 1)
+        self.cache.get("a")
+        self.cache.get("b")
+
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(self.cache.hit_ratio(), 0.5)
+        self.assertEqual(self.cache.pop("a"), 1)
+        self.assertIsNone(self.cache.pop("a"))
+
+
+class SingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def slow(self, result=None, error=None):
+        def function():
+            self.calls += 1
+            self.started.set()
+            self.release.wait(5)
+            if error is not None:
+                raise error
+            return result
+        return function
+
+    def run_concurrently(self, function, followers=4, wait=True):
+        with ThreadPoolExecutor(max_workers=followers + 1) as pool:
+            leader = pool.submit(self.flight.do, "key", function)
+            self.started.wait(5)
+            others = [pool.submit(self.flight.do, "key", function, wait) for _ in range(followers)]
+            # Followers register as waiting before the leader is released.
+            while wait and self.flight.shared < followers:
+                time.sleep(0.001)
+            self.release.set()
+            return [future.exception() or future.result() for future in [leader] + others]
+
+    def test_concurrent_calls_share_one_call(self):
+        results = self.run_concurrently(self.slow(result=[1]))
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.shared, 4)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_error_is_raised_to_every_caller(self):
+        error = ValueError("failed")
+        results = self.run_concurrently(self.slow(error=error))
+
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(result is error for result in results))
+
+    def test_callers_that_do_not_wait_run_the_function(self):
+        self.run_concurrently(self.slow(result=1), followers=2, wait=False)
+
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(self.flight.shared, 0)
+
+    def test_key_is_released_after_the_call(self):
+        self.release.set()
+        self.flight.do("key", self.slow(result=1))
+        self.flight.do("key", self.slow(result=2))
+
+        self.assertEqual(self.calls, 2)
+
+
+class ResultCacheTest(unittest.TestCase):
+    def test_key_ignores_dictionary_order(self):
+        self.assertEqual(ResultCache.key("brand", {"a": 1, "b": 2}), ResultCache.key("brand", {"b": 2, "a": 1}))
+        self.assertNotEqual(ResultCache.key("brand", {"a": 1}), ResultCache.key("other", {"a": 1}))
+
+    def test_computes_a_key_once(self):
+        results = ResultCache()
+        calls = []
+
+        for _ in range(3):
+            self.assertEqual(results.get_or_compute("key", lambda: calls.append(1) or "result"), "result")
+
+        self.assertEqual(len(calls), 1)
+
+
+class WarmStartStoreTest(unittest.TestCase):
+    def test_newest_genomes_first_without_duplicates(self):
+        store = WarmStartStore(per_key=3)
+        key = WarmStartStore.key("brand", [{"id": "b"}, {"id": "a"}])
+
+        store.add(key, [(("a", "1"),), (("a", "2"),)])
+        store.add(key, [(("a", "3"),), (("a", "1"),)])
+
+        self.assertEqual(key, WarmStartStore.key("brand", [{"id": "a"}, {"id": "b"}, {"id": "a"}]))
+        self.assertEqual(store.get(key), [(("a", "3"),), (("a", "1"),), (("a", "2"),)])
+        self.assertEqual(store.get("other"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Checks the catalog helpers of the database module.
+"""
+import asyncio
+import random
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from database import AsyncInMemoryBackend, AsyncKeyValidator, CachedKeyValidator, SimilarityChecker
+
+from helpers import FakeClock
+
+
+class CountingValidator:
+    """
+    A KeyValidator that accepts a fixed set of keys and counts its queries.
+    """
+
+    def __init__(self, keys, delay=0.0):
+        self.keys = set(keys)
+        self.delay = delay
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def validate_key(self, key):
+        with self._lock:
+            self.queries += 1
+        time.sleep(self.delay)
+        return key in self.keys
+
+
+class CachedKeyValidatorTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.backend = CountingValidator({"valid"})
+        self.validator = CachedKeyValidator(self.backend, ttl=300.0, negative_ttl=10.0)
+        self.validator.keys.clock = self.clock
+
+    def test_results_are_cached_for_their_ttl(self):
+        for _ in range(3):
+            self.assertTrue(self.validator.validate_key("valid"))
+            self.assertFalse(self.validator.validate_key("wrong"))
+        self.assertEqual(self.backend.queries, 2)
+
+        # Invalid keys are queried again sooner, so a newly issued key works quickly.
+        self.clock.now = 11.0
+        self.validator.validate_key("valid")
+        self.validator.validate_key("wrong")
+        self.assertEqual(self.backend.queries, 3)
+
+        self.clock.now = 301.0
+        self.validator.validate_key("valid")
+        self.assertEqual(self.backend.queries, 4)
+
+    def test_evicted_key_is_queried_again(self):
+        self.validator.validate_key("valid")
+        self.backend.keys.clear()
+        self.validator.evict("valid")
+
+        self.assertFalse(self.validator.validate_key("valid"))
+        self.assertEqual(self.backend.queries, 2)
+
+    def test_concurrent_misses_share_one_query(self):
+        self.backend.delay = 0.05
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(self.validator.validate_key, ["valid"] * 8))
+
+        self.assertTrue(all(results))
+        self.assertEqual(self.backend.queries, 1)
+
+
+class AsyncKeyValidatorTest(unittest.IsolatedAsyncioTestCase):
+    async def test_shares_the_cache_of_the_synchronous_validator(self):
+        cached = CachedKeyValidator(validator=None)
+        backend = AsyncInMemoryBackend(keys={"valid"}, latency=0.01)
+        validator = AsyncKeyValidator(cached, backend)
+
+        results = await asyncio.gather(*[validator.validate_key(key) for key in ["valid"] * 4 + ["wrong"]])
+
+        self.assertEqual(results, [True] * 4 + [False])
+        self.assertEqual(validator.flight.shared, 3)
+        self.assertTrue(cached.validate_key("valid"))
+        self.assertFalse(cached.validate_key("wrong"))
+
+
+class SimilarityCheckerTest(unittest.TestCase):
+    def test_indexed_mode_keeps_the_same_lists(self):
+        rng = random.Random(0)
+
+        for trial in range(150):
+            length = rng.randint(1, 8)
+            values = rng.randint(1, 4)
+            lists = [[rng.randrange(values) for _ in range(length)] for _ in range(rng.randint(1, 90))]
+            # Repeated lists are common in a population.
+            lists += rng.sample(lists, min(len(lists), 5))
+            rng.shuffle(lists)
+
+            for threshold in range(length + 2):
+                with self.subTest(trial=trial, threshold=threshold):
+                    checker = SimilarityChecker(lists)
+                    plain = checker.remove_similar_lists(threshold, indexed=False)
+
+                    self.assertEqual(checker.remove_similar_lists_indexed(threshold), plain)
+                    self.assertEqual(checker.remove_similar_lists(threshold, indexed=True), plain)
+
+    def test_default_mode_depends_on_population_size(self):
+        lists = [[index % 3, index % 5, index % 7] for index in range(SimilarityChecker.INDEX_MIN_SIZE + 1)]
+
+        for size in (SimilarityChecker.INDEX_MIN_SIZE, SimilarityChecker.INDEX_MIN_SIZE + 1):
+            checker = SimilarityChecker(lists[:size])
+            self.assertEqual(checker.remove_similar_lists(2), checker.remove_similar_lists(2, indexed=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Checks that fitness(), BatchFitness and IncrementalFitness give the same scores.
+
+Run with: python -m pytest tests
+"""
+import random
+import unittest
+
+import numpy as np
+
+from app import fitness
+from database import GenomeLimitCalculator, ProductFeatureIndex, ProductListConverter
+from methods.batchfitness import BatchFitness, IncrementalFitness
+from methods.colorsimilarity import exceeds
+from methods.compact import CompactEvolution
+
+TOLERANCE = 1e-9
+
+
+def make_products(types, products_per_type, seed, gray_ratio):
+    """
+    Builds filtered products with random colors, gray_ratio of them within the gray threshold.
+    """
+    rng = random.Random(seed)
+    catalog = []
+
+    for index in range(types):
+        products = []
+        for product in range(products_per_type):
+            if rng.random() < gray_ratio:
+                level = rng.randint(0, 255)
+                red, green, blue = (min(max(level + rng.randint(-6, 6), 0), 255) for _ in range(3))
+            else:
+                red, green, blue = rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)
+
+            products.append({
+                "id": "type%d-%d" % (index, product),
+                "price": str(rng.randint(5, 200)),
+                "color": [("#" if rng.random() < 0.5 else "") + "%02X%02X%02X" % (red, green, blue)],
+            })
+        catalog.append({"type%d" % index: products})
+
+    return ProductListConverter(products=catalog).convert_to_dictionary()
+
+
+class FitnessEquivalenceTest(unittest.TestCase):
+    # Mixed catalogs and gray-heavy ones, where most genomes have several gray products.
+    GRAY_RATIOS = (0.3, 0.9)
+
+    def test_batch_matches_fitness(self):
+        for gray_ratio in self.GRAY_RATIOS:
+            for seed in range(8):
+                types = seed + 1
+                products = make_products(types, 12, seed, gray_ratio)
+                features = ProductFeatureIndex(products)
+                rng = random.Random(seed)
+                population = [[rng.randrange(12) for _ in range(types)] for _ in range(500)]
+
+                scores = BatchFitness(products, features).evaluate(population)
+
+                for genome, score in zip(population, scores):
+                    with self.subTest(gray_ratio=gray_ratio, seed=seed, genome=genome):
+                        self.assertAlmostEqual(fitness(genome, products, features), score, delta=TOLERANCE)
+
+    def test_incremental_matches_evaluate(self):
+        for gray_ratio in self.GRAY_RATIOS:
+            for seed in range(8):
+                types = seed + 2
+                products = make_products(types, 30, seed, gray_ratio)
+                batch_fitness = BatchFitness(products, ProductFeatureIndex(products))
+                limits = GenomeLimitCalculator(products).calculate_genome_limits()
+                evolution = CompactEvolution(
+                    limits=limits,
+                    population_fitness=batch_fitness.evaluate,
+                    rng=np.random.default_rng(seed),
+                    incremental=IncrementalFitness(batch_fitness)
+                )
+
+                for generation, (population, scores) in enumerate(evolution.generations(size=100, generation=40)):
+                    with self.subTest(gray_ratio=gray_ratio, seed=seed, generation=generation):
+                        # Limits are the highest gene of every type, so genes always name a product.
+                        self.assertTrue((population <= np.array(limits)).all())
+                        np.testing.assert_allclose(scores, batch_fitness.evaluate(population), rtol=0, atol=TOLERANCE)
+
+    def test_rounding_does_not_cross_a_threshold(self):
+        # Averages that equal a threshold, summed in an order that lands just above it.
+        self.assertFalse(exceeds(0.1 + 0.2 + 0.3, 0.60))
+        self.assertFalse(exceeds(sum([0.1] * 3) * 1.5, 0.45))
+        self.assertTrue(exceeds(0.6 + 1e-6, 0.60))
+        np.testing.assert_array_equal(exceeds(np.array([0.4, np.nextafter(0.4, 1), 0.41]), 0.40), [False, False, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
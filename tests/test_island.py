@@ -0,0 +1,95 @@
+"""
+Checks the island model: published fitness engines, seeding and the hall of fame.
+"""
+import os
+import random
+import tempfile
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+from database import GenomeLimitCalculator, ProductFeatureIndex, ProductListConverter
+from methods import island
+from methods.batchfitness import BatchFitness
+from methods.genetic import HallOfFame
+from methods.island import IslandModel, evolve_island, publish, release
+
+from helpers import make_catalog
+
+
+def catalog(types=5, products_per_type=30):
+    products = ProductListConverter(products=make_catalog(types, products_per_type, seed=2)).convert_to_dictionary()
+    return BatchFitness(products, ProductFeatureIndex(products)), GenomeLimitCalculator(products).calculate_genome_limits()
+
+
+class IslandTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patches = [
+            mock.patch.object(island, "_published", OrderedDict()),
+            mock.patch.object(island, "_worker_state", OrderedDict()),
+            mock.patch.object(island, "_directory", directory.name),
+            mock.patch.object(island, "MAX_PUBLISHED", 1),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.batch_fitness, self.limits = catalog()
+
+    def test_files_in_use_are_never_deleted(self):
+        path = publish("a", self.batch_fitness)
+        self.assertEqual(publish("a", self.batch_fitness), path)
+
+        # Two more keys finish while "a" is still used by a run.
+        for key in ("b", "c"):
+            publish(key, self.batch_fitness)
+            release(key)
+
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(list(island._published), ["a", "c"])
+
+        release("a")
+        self.assertTrue(os.path.exists(path))
+        release("a")
+        self.assertEqual(list(island._published), ["c"])
+        self.assertFalse(os.path.exists(path))
+
+    def test_island_is_reproducible_and_keeps_every_generation(self):
+        path = publish("a", self.batch_fitness)
+        self.addCleanup(release, "a")
+        rng = random.Random(0)
+        sample = [[rng.randint(0, limit) for limit in self.limits] for _ in range(200)]
+        seeds = [sample[int(self.batch_fitness.evaluate(sample).argmax())]]
+
+        def evolve():
+            # Larger than every genome scored, so nothing is evicted.
+            hall_of_fame = HallOfFame(capacity=1000, threshold=0.0)
+            population, scores, generations_run, elites = evolve_island(
+                "a", path, self.limits, seeds, 20, 6, 7, hall_of_fame=hall_of_fame
+            )
+            return population, scores, elites
+
+        population, scores, elites = evolve()
+
+        self.assertEqual(evolve(), (population, scores, elites))
+        self.assertEqual(len(population), 20)
+        # The warm start is scored in the first generation, and earlier generations reach the hall.
+        self.assertIn(seeds[0], [genome for genome, score in elites])
+        self.assertGreater(len(elites), len(population))
+
+    def test_seeded_runs_are_reproducible(self):
+        model = IslandModel(self.limits, self.batch_fitness, workers=2, migration_interval=2, key="a")
+
+        runs = []
+        for _ in range(2):
+            hall_of_fame = HallOfFame(capacity=32, threshold=0.0)
+            genomes = model.run(size=12, generation=4, hall_of_fame=hall_of_fame, seed=3, seeds=[[1] * len(self.limits)])
+            runs.append((genomes, hall_of_fame.best()))
+
+        self.assertEqual(runs[0], runs[1])
+        self.assertEqual(island._published["a"][1], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+"""
+Checks the search executor admission, the job store and the routes that use them.
+"""
+import json
+import threading
+import unittest
+from unittest import mock
+
+import app
+import database
+from cache import ResultCache, TTLCache
+from database import CachedKeyValidator, CatalogCache, InMemoryCatalogBackend
+from jobs import JobExecutor, JobStore, Saturated
+
+from helpers import FakeClock, make_catalog, make_requirements
+
+
+class JobExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = JobExecutor(workers=1, max_queue=1)
+        self.release = threading.Event()
+        self.addCleanup(self.executor.shutdown)
+        self.addCleanup(self.release.set)
+
+    def test_rejects_beyond_workers_and_queue(self):
+        running = self.executor.submit(self.release.wait)
+        queued = self.executor.submit(self.release.wait)
+
+        with self.assertRaises(Saturated) as raised:
+            self.executor.submit(self.release.wait)
+
+        self.assertEqual(self.executor.rejected, 1)
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+
+        self.release.set()
+        running.result(timeout=5)
+        queued.result(timeout=5)
+        self.assertEqual(self.executor.submit(lambda: 7).result(timeout=5), 7)
+
+    def test_retry_after_follows_job_duration_and_queue(self):
+        self.executor._duration = 3.0
+        self.assertEqual(self.executor.retry_after(), 3)
+
+        self.executor.queued = 2
+        self.assertEqual(self.executor.retry_after(), 9)
+
+    def test_call_runs_inline_on_a_worker(self):
+        executor = JobExecutor(workers=1, max_queue=0)
+        self.addCleanup(executor.shutdown)
+
+        # A nested call would otherwise be rejected by the only, busy, worker.
+        self.assertTrue(executor.call(lambda: executor.call(executor.on_worker)))
+        self.assertFalse(executor.on_worker())
+
+
+class JobStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = JobExecutor(workers=1, max_queue=1)
+        self.addCleanup(self.executor.shutdown)
+        self.clock = FakeClock()
+        self.store = JobStore(ttl=60.0)
+        self.store.jobs = TTLCache(max_size=16, ttl=60.0, clock=self.clock)
+
+    def wait(self):
+        self.executor.submit(lambda: None).result(timeout=5)
+
+    def test_only_the_owner_reads_a_job(self):
+        job = self.store.submit(self.executor, "owner", lambda: {"recommendations": []})
+        self.wait()
+
+        self.assertIs(self.store.get(job.id, "owner"), job)
+        self.assertIsNone(self.store.get(job.id, "other"))
+        self.assertEqual(job.to_dict()["status"], "done")
+
+    def test_failed_job_hides_the_error(self):
+        def fail():
+            raise ValueError("secret detail")
+
+        with self.assertLogs(level="ERROR"):
+            job = self.store.submit(self.executor, "owner", fail)
+            self.wait()
+
+        self.assertEqual(job.status, "failed")
+        self.assertNotIn("secret detail", job.to_dict()["error"])
+
+    def test_jobs_expire_after_finishing(self):
+        self.clock.now = 100.0
+        job = self.store.submit(self.executor, "owner", lambda: 1)
+        self.wait()
+
+        self.clock.now = 159.0
+        self.assertIs(self.store.get(job.id, "owner"), job)
+        self.clock.now = 161.0
+        self.assertIsNone(self.store.get(job.id, "owner"))
+
+    def test_rejected_job_is_not_kept(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.executor.submit(release.wait)
+        self.executor.submit(release.wait)
+
+        with self.assertRaises(Saturated):
+            self.store.submit(self.executor, "owner", lambda: 1)
+
+        self.assertEqual(len(self.store.jobs), 0)
+
+
+class JobRoutesTest(unittest.TestCase):
+    headers = {"brand": "brand", "secret-key": "key"}
+
+    def setUp(self):
+        validator = CachedKeyValidator(validator=None)
+        validator.remember("key", True)
+        validator.remember("other", True)
+        self.executor = JobExecutor(workers=1, max_queue=1)
+        self.addCleanup(self.executor.shutdown)
+        patches = [
+            mock.patch.object(app, "catalog_cache", CatalogCache(InMemoryCatalogBackend({"brand": make_catalog(4, 6)}))),
+            mock.patch.object(database, "key_validator", validator),
+            mock.patch.object(app, "search_executor", self.executor),
+            mock.patch.object(app, "job_store", JobStore()),
+            mock.patch.object(app, "result_cache", ResultCache()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client = app.app.test_client()
+
+    def saturate(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.executor.submit(release.wait)
+        self.executor.submit(release.wait)
+        return release
+
+    def test_job_result_is_polled_by_its_owner(self):
+        response = self.client.post("/jobs", json={"requirements": make_requirements(4), "seed": 1}, headers=self.headers)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.headers["Location"], "/jobs/%s" % response.json["id"])
+
+        self.executor.submit(lambda: None).result(timeout=30)
+        job = self.client.get(response.headers["Location"], headers=self.headers)
+        other = self.client.get(response.headers["Location"], headers={"brand": "brand", "secret-key": "other"})
+
+        self.assertEqual(job.json["status"], "done")
+        self.assertIn("recommendations", job.json["result"])
+        self.assertEqual(other.status_code, 404)
+
+    def test_saturated_executor_answers_429_with_retry_after(self):
+        self.saturate()
+        body = {"requirements": make_requirements(4), "seed": 2}
+
+        for path in ("/jobs", "/generate", "/generate/stream"):
+            response = self.client.post(path, json=body, headers=self.headers)
+            self.assertEqual(response.status_code, 429, path)
+            self.assertGreaterEqual(int(response.headers["Retry-After"]), 1)
+
+    def test_stream_ends_with_a_summary(self):
+        response = self.client.post("/generate/stream", json={"requirements": make_requirements(4), "seed": 1}, headers=self.headers)
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+
+        self.assertEqual(lines[-1], {"summary": {"recommendations": len(lines) - 1}})
+
+    def test_closed_stream_frees_its_worker(self):
+        response = self.client.post(
+            "/generate/stream", json={"requirements": make_requirements(4)}, headers=self.headers, buffered=False
+        )
+        response.close()
+
+        self.assertIsNone(self.executor.submit(lambda: None).result(timeout=30))
+        self.assertEqual(self.executor.running, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
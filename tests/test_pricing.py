@@ -0,0 +1,102 @@
+"""
+Checks PriceBounds against every combination of small random cost sets.
+"""
+import itertools
+import unittest
+
+import numpy as np
+
+from methods.pricing import PriceBounds
+
+
+def random_bounds(rng, min_price=True, max_price=True):
+    costs = [np.sort(rng.integers(1, 40, size=rng.integers(1, 6))).astype(float) for _ in range(rng.integers(1, 5))]
+
+    if rng.random() < 0.5:
+        # Bounds equal to the total of some combination check the inclusive ends.
+        totals = PriceBounds(costs).totals(combinations(PriceBounds(costs)))
+        low, high = np.sort(rng.choice(totals, size=2))
+    else:
+        cheapest = sum(cost[0] for cost in costs)
+        dearest = sum(cost[-1] for cost in costs)
+        low, high = np.sort(rng.uniform(cheapest - 10, dearest + 10, size=2))
+
+    return PriceBounds(costs, min_price=low if min_price else None, max_price=high if max_price else None)
+
+
+def combinations(bounds):
+    return np.array(list(itertools.product(*[range(len(cost)) for cost in bounds.costs])))
+
+
+class PriceBoundsTest(unittest.TestCase):
+    trials = 400
+
+    def check_ranges(self, bounds, exact):
+        genomes = combinations(bounds)
+        feasible = genomes[bounds.feasible(genomes)]
+        ranges = bounds.ranges()
+
+        if not len(feasible):
+            if exact:
+                self.assertTrue(all(start == stop for start, stop in ranges))
+            return
+
+        for column, (start, stop) in enumerate(ranges):
+            used = set(feasible[:, column].tolist())
+            # No feasible combination is dropped, and with one bound every kept gene is used.
+            self.assertTrue(used <= set(range(start, stop)))
+            if exact:
+                self.assertEqual(used, set(range(start, stop)))
+
+        trimmed = bounds.trim(ranges)
+        offsets = np.array([start for start, stop in ranges])
+        self.assertEqual(int(trimmed.feasible(combinations(trimmed)).sum()), len(feasible))
+        self.assertTrue(trimmed.feasible(feasible - offsets).all())
+
+    def test_ranges_keep_every_feasible_gene(self):
+        rng = np.random.default_rng(0)
+        for trial in range(self.trials):
+            with self.subTest(trial=trial):
+                self.check_ranges(random_bounds(rng), exact=False)
+
+    def test_ranges_are_exact_with_one_bound(self):
+        rng = np.random.default_rng(1)
+        for trial in range(self.trials):
+            with self.subTest(trial=trial):
+                self.check_ranges(random_bounds(rng, min_price=trial % 2 == 0, max_price=trial % 2 == 1), exact=True)
+
+    def test_repair_reaches_a_single_bound_when_possible(self):
+        rng = np.random.default_rng(2)
+        for trial in range(self.trials):
+            with self.subTest(trial=trial):
+                upper = trial % 2 == 0
+                bounds = random_bounds(rng, min_price=not upper, max_price=upper)
+                genomes = combinations(bounds)
+                repaired = genomes.copy()
+                bounds.repair(repaired, rng)
+
+                # Genes only move towards the bound, and feasible genomes are left alone.
+                moved = repaired <= genomes if upper else repaired >= genomes
+                self.assertTrue(moved.all())
+                already = bounds.feasible(genomes)
+                self.assertTrue((repaired[already] == genomes[already]).all())
+                if already.any():
+                    self.assertTrue(bounds.feasible(repaired).all())
+
+    def test_repair_keeps_genes_in_range(self):
+        rng = np.random.default_rng(3)
+        for trial in range(self.trials):
+            with self.subTest(trial=trial):
+                bounds = random_bounds(rng)
+                genomes = combinations(bounds)
+                repaired = genomes.copy()
+                bounds.repair(repaired, rng)
+
+                for column, cost in enumerate(bounds.costs):
+                    self.assertTrue(((repaired[:, column] >= 0) & (repaired[:, column] < len(cost))).all())
+                already = bounds.feasible(genomes)
+                self.assertTrue((repaired[already] == genomes[already]).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
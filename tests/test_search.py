@@ -0,0 +1,46 @@
+"""
+Checks RecommendationSearch on synthetic catalogs.
+"""
+import unittest
+
+import app
+from database import CatalogEntry, ProductListConverter
+
+from helpers import make_catalog, make_requirements
+
+
+def catalog_entry(types, products_per_type, seed=0):
+    products = ProductListConverter(products=make_catalog(types, products_per_type, seed=seed)).convert_to_dictionary()
+    return CatalogEntry("brand-%d" % seed, products)
+
+
+class RecommendationSearchTest(unittest.TestCase):
+    def setUp(self):
+        app.warm_starts.genomes.clear()
+        self.addCleanup(app.warm_starts.genomes.clear)
+
+    def pool(self, entry, seed):
+        search = app.RecommendationSearch(entry, make_requirements(5), seed=seed)
+        return [(genome, score) for genome, score, data in search.pool(size=12)]
+
+    def test_seeded_search_ignores_warm_starts(self):
+        entry = catalog_entry(5, 60)
+        first = self.pool(entry, seed=3)
+
+        # Seeded searches still store what they found for later unseeded ones.
+        for seed in range(4):
+            app.RecommendationSearch(entry, make_requirements(5), seed=seed).pool(size=12)
+
+        self.assertTrue(app.warm_starts.get(app.RecommendationSearch(entry, make_requirements(5)).warm_start_key))
+        self.assertEqual(app.RecommendationSearch(entry, make_requirements(5), seed=3).seeds, [])
+        self.assertEqual(self.pool(entry, seed=3), first)
+
+    def test_unseeded_search_starts_from_warm_starts(self):
+        entry = catalog_entry(5, 60)
+        self.assertTrue(self.pool(entry, seed=1))
+
+        self.assertTrue(app.RecommendationSearch(entry, make_requirements(5)).seeds)
+
+
+if __name__ == "__main__":
+    unittest.main()
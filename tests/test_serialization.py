@@ -0,0 +1,74 @@
+"""
+Checks that every response path encodes values the same way.
+"""
+import dataclasses
+import datetime
+import decimal
+import json
+import unittest
+import uuid
+from unittest import mock
+
+import numpy as np
+
+import app
+import serialization
+from serialization import dumps
+
+
+@dataclasses.dataclass
+class Dimensions:
+    width: float
+    height: float
+
+
+VALUE = {
+    "added": datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+    "day": datetime.date(2024, 5, 2),
+    "price": decimal.Decimal("19.90"),
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "dimensions": Dimensions(1.5, 2.0),
+    "score": np.float64(0.95),
+    "genes": np.arange(3),
+    "name": "Ürün",
+    3: "a non-string key",
+}
+
+EXPECTED = {
+    "added": "Wed, 01 May 2024 12:30:00 GMT",
+    "day": "Thu, 02 May 2024 00:00:00 GMT",
+    "price": "19.90",
+    "uuid": "12345678-1234-5678-1234-567812345678",
+    "dimensions": {"width": 1.5, "height": 2.0},
+    "score": 0.95,
+    "genes": [0, 1, 2],
+    "name": "Ürün",
+    "3": "a non-string key",
+}
+
+
+class DumpsTest(unittest.TestCase):
+    def test_orjson_and_json_encode_the_same(self):
+        encoded = dumps(VALUE)
+
+        with mock.patch.object(serialization, "orjson", None):
+            self.assertEqual(json.loads(dumps(VALUE)), EXPECTED)
+
+        self.assertEqual(json.loads(encoded), EXPECTED)
+
+    def test_flask_uses_the_same_encoder(self):
+        with app.app.app_context():
+            self.assertEqual(app.jsonify(VALUE).get_json(), EXPECTED)
+            self.assertEqual(app.json.dumps(VALUE), dumps(VALUE).decode("utf-8"))
+
+    def test_unknown_types_are_refused(self):
+        with self.assertRaises(TypeError):
+            dumps({"owner": object()})
+
+        with mock.patch.object(serialization, "orjson", None):
+            with self.assertRaises(TypeError):
+                dumps({"owner": object()})
+
+
+if __name__ == "__main__":
+    unittest.main()
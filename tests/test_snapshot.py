@@ -0,0 +1,139 @@
+"""
+Checks that catalog snapshots read back what was written.
+"""
+import datetime
+import math
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from database import CatalogCache, InMemoryCatalogBackend, ProductListConverter
+from methods.colorsimilarity import ColorProfile
+from snapshot import CatalogSnapshot, SnapshotStore, write_snapshot
+
+from helpers import make_catalog
+
+
+def catalog_products(seed=0):
+    products = ProductListConverter(products=make_catalog(3, 5, seed=seed)).convert_to_dictionary()
+    first = products["type0"]
+    first[0]["price"] = "not a price"
+    del first[1]["price"]
+    first[2]["color"] = []
+    first[3]["color"] = ["nothex"]
+    first[4]["added"] = datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc)
+    products["empty"] = []
+    return products
+
+
+class CatalogSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(self.directory, "catalog.snapshot")
+
+    def test_round_trip(self):
+        products = catalog_products()
+        write_snapshot(self.path, brand="brand", version="v1", products=products)
+        snapshot = CatalogSnapshot(self.path)
+
+        self.assertEqual((snapshot.brand, snapshot.version), ("brand", "v1"))
+        self.assertEqual(snapshot.types, list(products))
+        self.assertEqual(snapshot.type_offsets.tolist(), [0, 5, 10, 15, 15])
+        self.assertEqual(list(snapshot.products), list(products))
+
+        for key, values in products.items():
+            self.assertEqual(snapshot.type_ids(key), [product["id"] for product in values])
+            self.assertEqual(len(snapshot.products[key]), len(values))
+
+            for index, product in enumerate(values):
+                stored = snapshot.products[key][index]
+                expected = dict(product)
+                if "added" in expected:
+                    expected["added"] = "Wed, 01 May 2024 12:30:00 GMT"
+                self.assertEqual(stored, expected)
+
+                price = snapshot.type_prices(key)[index]
+                try:
+                    self.assertEqual(price, float(product["price"]))
+                except (KeyError, ValueError):
+                    self.assertTrue(math.isnan(price))
+
+                start, stop = snapshot.type_range(key)
+                profile = ColorProfile.parse((product.get("color") or [None])[0], threshold=snapshot.gray_threshold)
+                self.assertEqual(bool(snapshot.known[start + index]), profile is not None)
+                if profile is not None:
+                    self.assertEqual(tuple(snapshot.rgb[start + index]), tuple(profile.rgb))
+                    np.testing.assert_allclose(snapshot.hsv[start + index], profile.hsv)
+                    self.assertEqual(bool(snapshot.gray[start + index]), profile.is_gray)
+
+        self.assertEqual(snapshot.products["type1"][-1], products["type1"][-1])
+        self.assertEqual(snapshot.products["type1"][1:3], products["type1"][1:3])
+        with self.assertRaises(IndexError):
+            snapshot.products["type1"][5]
+        with self.assertRaises(KeyError):
+            snapshot.products["missing"]
+
+    def test_unknown_types_are_not_written(self):
+        products = catalog_products()
+        products["type1"][0]["owner"] = object()
+
+        with self.assertRaises(TypeError):
+            write_snapshot(self.path, brand="brand", version="v1", products=products)
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as output:
+            output.write(b"\0" * 64)
+
+        with self.assertRaises(ValueError):
+            CatalogSnapshot(self.path)
+
+
+class SnapshotStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SnapshotStore(directory.name, ttl=60.0)
+
+    def test_save_current_and_expire(self):
+        self.assertIsNone(self.store.current("brand"))
+
+        self.store.save("brand", "v1", catalog_products(seed=1))
+        saved = self.store.save("brand", "v2", catalog_products(seed=2))
+        current = self.store.current("brand")
+
+        self.assertEqual(current.version, "v2")
+        self.assertEqual(current.type_ids("type0"), saved.type_ids("type0"))
+        self.assertFalse(os.path.exists(self.store.path("brand", "v1")))
+        self.assertIsNone(self.store.current("other"))
+
+        self.store.expire("brand")
+        self.assertIsNone(self.store.current("brand"))
+
+    def test_old_pointer_is_not_served(self):
+        self.store.save("brand", "v1", catalog_products())
+        old = time.time() - 120
+        os.utime(self.store.pointer("brand"), (old, old))
+
+        self.assertIsNone(self.store.current("brand"))
+
+    def test_catalog_cache_serves_unwritable_catalogs_from_memory(self):
+        catalog = make_catalog(2, 3)
+        list(catalog[0].values())[0][0]["owner"] = object()
+        catalogs = CatalogCache(InMemoryCatalogBackend({"brand": catalog}), snapshots=self.store)
+
+        with self.assertLogs(level="ERROR"):
+            entry = catalogs.get("brand")
+
+        self.assertEqual(len(entry.products["type0"]), 3)
+        self.assertIsNone(self.store.current("brand"))
+
+
+if __name__ == "__main__":
+    unittest.main()